@@ -0,0 +1,141 @@
+# Матрица закреплений тренер x оборудование для аналитики.
+#
+#   matrix = load_allocation_matrix(database)
+#   matrix.csr()                 # (indptr, indices, data) для scipy.sparse.csr_matrix
+#   matrix.dense()               # numpy.ndarray формы (тренеры, оборудование)
+#   matrix.trainer_totals()      # единиц оборудования у каждого тренера
+#   matrix.type_totals()         # единиц по Equipment.type
+#   matrix.top_trainers(10)      # 10 тренеров с наибольшим числом единиц
+#
+# trainer_equipment читается пакетами через fetchmany, каждый пакет сразу
+# переводится в массив NumPy, поэтому словари и объекты на каждую строку не
+# создаются. Все итоги считаются векторно (bincount, argpartition).
+# Нужен numpy, для to_scipy() - scipy; без них остальной проект работает как обычно
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from main import DEFAULT_BATCH_SIZE, get_database, _fetch_in_batches
+
+TRAINER_IDS_SQL = "SELECT id FROM trainers ORDER BY id"
+EQUIPMENT_SQL = "SELECT id, type FROM equipment ORDER BY id"
+ALLOCATIONS_SQL = "SELECT trainer_id, equipment_id, quantity FROM trainer_equipment"
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("analytics requires numpy: pip install numpy")
+
+# Столбцы результата запроса в массивы NumPy: пакеты по batch_size строк
+# превращаются в двумерный массив целиком и склеиваются в конце
+def _read_int_columns(conn, query, columns, batch_size):
+    cursor = conn.execute(query)
+    batches = []
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        batches.append(np.array(rows, dtype=np.int64))
+    if not batches:
+        return np.empty((0, columns), dtype=np.int64)
+    return np.concatenate(batches)
+
+# Разреженная матрица закреплений в формате COO: rows[i], cols[i] - позиции
+# тренера и оборудования в trainer_ids и equipment_ids, data[i] - количество.
+# trainer_ids и equipment_ids отсортированы и задают соответствие позиция -> ID
+class AllocationMatrix:
+    __slots__ = ('trainer_ids', 'equipment_ids', 'equipment_types', 'rows', 'cols', 'data')
+
+    def __init__(self, trainer_ids, equipment_ids, equipment_types, rows, cols, data):
+        self.trainer_ids = trainer_ids
+        self.equipment_ids = equipment_ids
+        self.equipment_types = equipment_types
+        self.rows = rows
+        self.cols = cols
+        self.data = data
+
+    @property
+    def shape(self):
+        return len(self.trainer_ids), len(self.equipment_ids)
+
+    # Позиции ID в матрице (массив; -1 для ID, которых в матрице нет)
+    def trainer_positions(self, trainer_ids):
+        return _positions(self.trainer_ids, trainer_ids)
+
+    def equipment_positions(self, equipment_ids):
+        return _positions(self.equipment_ids, equipment_ids)
+
+    # COO -> CSR: (indptr, indices, data), строки упорядочены по тренеру
+    def csr(self):
+        order = np.lexsort((self.cols, self.rows))
+        indptr = np.zeros(self.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.rows, minlength=self.shape[0]), out=indptr[1:])
+        return indptr, self.cols[order], self.data[order]
+
+    def dense(self, dtype=None):
+        # Пара (тренер, оборудование) - первичный ключ trainer_equipment, повторов нет
+        matrix = np.zeros(self.shape, dtype=dtype or self.data.dtype)
+        matrix[self.rows, self.cols] = self.data
+        return matrix
+
+    # scipy.sparse-матрица в формате format ('csr', 'coo', 'csc', ...)
+    def to_scipy(self, format='csr'):
+        from scipy import sparse
+        return sparse.coo_matrix((self.data, (self.rows, self.cols)), shape=self.shape).asformat(format)
+
+    # Итоги по строкам и столбцам: массивы в порядке trainer_ids и equipment_ids
+    def trainer_totals(self):
+        return np.bincount(self.rows, weights=self.data, minlength=self.shape[0]).astype(np.int64)
+
+    def equipment_totals(self):
+        return np.bincount(self.cols, weights=self.data, minlength=self.shape[1]).astype(np.int64)
+
+    # (типы оборудования по алфавиту, единицы каждого типа у всех тренеров)
+    def type_totals(self):
+        types, type_of_column = np.unique(self.equipment_types, return_inverse=True)
+        totals = np.bincount(type_of_column[self.cols], weights=self.data, minlength=len(types))
+        return types, totals.astype(np.int64)
+
+    # k тренеров (или оборудования) с наибольшими итогами: (ID, итоги) по убыванию
+    def top_trainers(self, k):
+        return _top(self.trainer_ids, self.trainer_totals(), k)
+
+    def top_equipment(self, k):
+        return _top(self.equipment_ids, self.equipment_totals(), k)
+
+def _positions(sorted_ids, ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(sorted_ids) == 0:
+        return np.full(ids.shape, -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == ids, positions, -1)
+
+# argpartition выбирает k наибольших за O(n), сортируются только они
+def _top(ids, totals, k):
+    k = min(k, len(totals))
+    if k <= 0:
+        return ids[:0], totals[:0]
+    best = np.argpartition(totals, len(totals) - k)[len(totals) - k:]
+    best = best[np.argsort(-totals[best], kind='stable')]
+    return ids[best], totals[best]
+
+# Загрузка матрицы закреплений из БД через соединение DB API.
+# Строки trainer_equipment без существующего тренера или оборудования пропускаются
+def load_allocation_matrix(database=None, batch_size=DEFAULT_BATCH_SIZE):
+    _require_numpy()
+    database = database or get_database()
+    with database.connection() as conn:
+        trainer_ids = _read_int_columns(conn, TRAINER_IDS_SQL, 1, batch_size)[:, 0]
+        equipment_ids, equipment_types = [], []
+        for equipment_id, type in _fetch_in_batches(conn.execute(EQUIPMENT_SQL), batch_size):
+            equipment_ids.append(equipment_id)
+            equipment_types.append(type)
+        allocations = _read_int_columns(conn, ALLOCATIONS_SQL, 3, batch_size)
+    equipment_ids = np.array(equipment_ids, dtype=np.int64)
+    rows = _positions(trainer_ids, allocations[:, 0])
+    cols = _positions(equipment_ids, allocations[:, 1])
+    known = (rows >= 0) & (cols >= 0)
+    return AllocationMatrix(
+        trainer_ids, equipment_ids, np.array(equipment_types, dtype=object),
+        rows[known], cols[known], allocations[known, 2],
+    )
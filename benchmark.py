@@ -0,0 +1,278 @@
+# Нагрузочное сравнение ORM, DB API и Core реализаций интерфейсов.
+#
+# Для каждого масштаба генерируется синтетическая база (залы, тренеры, оборудование,
+# закрепления), затем для каждого бэкенда на своей копии этой базы замеряются все
+# методы интерфейсов: пропускная способность и задержки p50/p95/p99.
+# Результаты пишутся в JSON, который можно сравнить с предыдущим прогоном:
+#
+#   python benchmark.py --scales 100,1000,10000 --output bench.json
+#   python benchmark.py --scales 100,1000,10000 --compare bench.json --output bench_new.json
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from main import (
+    DEFAULT_PAGE_SIZE, Base, Database,
+    TrainerManagementBase, EquipmentManagementBase, RoomManagementBase,
+    TrainerManagementORM, EquipmentManagementORM, RoomManagementORM,
+    TrainerManagementDBAPI, EquipmentManagementDBAPI, RoomManagementDBAPI,
+    TrainerManagementCore, EquipmentManagementCore, RoomManagementCore,
+)
+
+BACKENDS = {
+    'orm': (TrainerManagementORM, EquipmentManagementORM, RoomManagementORM),
+    'dbapi': (TrainerManagementDBAPI, EquipmentManagementDBAPI, RoomManagementDBAPI),
+    'core': (TrainerManagementCore, EquipmentManagementCore, RoomManagementCore),
+}
+
+SPECIALIZATIONS = ["Бодибилдинг", "Пауэрлифтинг", "Фитнес", "Кроссфит", "Пилатес", "TRX"]
+EQUIPMENT_TYPES = ["Силовая тренировка", "Кардио", "Функциональный тренинг"]
+
+# Размер пакета для *_many методов при замерах
+BATCH_SIZE = 100
+
+# Методы интерфейсов: для каждого в scenarios должен быть замер
+INTERFACE_METHODS = frozenset().union(
+    *(base.__abstractmethods__ for base in (TrainerManagementBase, EquipmentManagementBase, RoomManagementBase))
+)
+
+# Синтетический зал масштаба scale: scale тренеров и scale закреплений оборудования
+def generate_gym(database, scale, seed=0):
+    rng = random.Random(seed)
+    rooms = max(1, scale // 50)
+    equipment = max(10, scale // 100)
+    Base.metadata.create_all(database.engine)
+
+    room_manager = RoomManagementDBAPI(database)
+    trainer_manager = TrainerManagementDBAPI(database)
+    equipment_manager = EquipmentManagementDBAPI(database)
+
+    room_manager.add_rooms_many(
+        (f"Зал {i}", f"ул. Спортивная, {i}", rng.randint(10, 50)) for i in range(1, rooms + 1)
+    )
+    # Склад с запасом: закрепления при замерах не должны упираться в остатки
+    equipment_manager.add_equipment_many(
+        (f"Снаряд {i}", rng.choice(EQUIPMENT_TYPES), rng.randint(scale * 100, scale * 1000)) for i in range(1, equipment + 1)
+    )
+    trainer_manager.add_trainers_many(
+        (f"Тренер {i}", rng.choice(SPECIALIZATIONS), rng.randint(0, 30), rng.randint(1, rooms))
+        for i in range(1, scale + 1)
+    )
+    equipment_manager.assign_equipment_many(
+        (rng.randint(1, scale), rng.randint(1, equipment), rng.randint(1, 5)) for _ in range(scale)
+    )
+    return {'rooms': rooms, 'trainers': scale, 'equipment': equipment, 'allocations': scale}
+
+def percentile(sorted_values, fraction):
+    # Метод ближайшего ранга
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def measure(call, samples):
+    latencies = []
+    for i in range(samples):
+        started = time.perf_counter()
+        call(i)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'samples': samples,
+        'total_s': total,
+        'ops_per_s': samples / total if total else None,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'min_ms': latencies[0] * 1000,
+        'max_ms': latencies[-1] * 1000,
+    }
+
+# Сценарии замеров: (имя метода, функция от номера итерации, число итераций)
+def scenarios(trainer_manager, equipment_manager, room_manager, sizes, samples, seed):
+    rng = random.Random(seed)
+    trainers, rooms, equipment = sizes['trainers'], sizes['rooms'], sizes['equipment']
+    # Тренеров удаляем с конца диапазона, залы - только добавленные в ходе замеров
+    new_room_ids = iter(range(rooms + 1, rooms + 1 + samples))
+
+    def trainer_batch(_):
+        return [(f"Новый тренер {rng.random()}", rng.choice(SPECIALIZATIONS), 1, rng.randint(1, rooms))
+                for _ in range(BATCH_SIZE)]
+
+    # Потоковые выборки дочитываются до конца, чтобы замер включал все пакеты
+    def drain(iterator):
+        for _ in iterator:
+            pass
+
+    # Постраничный обход: каждый замер читает следующую страницу, после последней - снова первую
+    cursors = {}
+
+    def next_page(name, read_page):
+        items, cursors[name] = read_page(cursors.get(name))
+        return items
+
+    # delete_trainers удаляет группу (специализация, зал). Групп удаляется не больше
+    # половины, чтобы delete_room_cascade было что удалять
+    groups = [(specialization, room_id) for room_id in range(1, rooms + 1) for specialization in SPECIALIZATIONS]
+    rng.shuffle(groups)
+
+    # calculate_all_trainer_equipment и iter_trainer_equipment читают всю базу, поэтому замеров меньше
+    full_scan_samples = max(1, min(samples, 5))
+    return [
+        ('select_trainers_by_room', lambda i: trainer_manager.select_trainers_by_room(rng.randint(1, rooms)), samples),
+        ('calculate_trainer_equipment', lambda i: equipment_manager.calculate_trainer_equipment(rng.randint(1, trainers)), samples),
+        ('calculate_all_trainer_equipment', lambda i: equipment_manager.calculate_all_trainer_equipment(), full_scan_samples),
+        ('select_trainer_equipment', lambda i: equipment_manager.select_trainer_equipment(rng.randint(1, trainers)), samples),
+        ('select_rooms', lambda i: room_manager.select_rooms(), samples),
+        ('iter_trainers_by_room', lambda i: drain(trainer_manager.iter_trainers_by_room(rng.randint(1, rooms))), samples),
+        ('iter_trainer_equipment', lambda i: drain(equipment_manager.iter_trainer_equipment()), full_scan_samples),
+        ('page_trainers_by_room', lambda i: next_page('trainers', lambda cursor: trainer_manager.page_trainers_by_room(
+            1, DEFAULT_PAGE_SIZE, cursor)), samples),
+        ('page_equipment', lambda i: next_page('equipment', lambda cursor: equipment_manager.page_equipment(
+            DEFAULT_PAGE_SIZE, cursor)), samples),
+        ('get_equipment_availability', lambda i: equipment_manager.get_equipment_availability(rng.randint(1, equipment)), samples),
+        ('select_over_allocated_equipment', lambda i: equipment_manager.select_over_allocated_equipment(), samples),
+        ('get_trainer_allocated', lambda i: equipment_manager.get_trainer_allocated(rng.randint(1, trainers)), samples),
+        ('search_trainers', lambda i: trainer_manager.search_trainers(rng.choice(SPECIALIZATIONS)[:4]), samples),
+        ('search_equipment', lambda i: equipment_manager.search_equipment(rng.choice(EQUIPMENT_TYPES).split()[0]), samples),
+        ('room_utilization_report', lambda i: room_manager.room_utilization_report(), samples),
+        ('add_trainer', lambda i: trainer_manager.add_trainer(f"Новый тренер {i}", rng.choice(SPECIALIZATIONS), 1, rng.randint(1, rooms)), samples),
+        ('update_trainer_room', lambda i: trainer_manager.update_trainer_room(rng.randint(1, trainers), rng.randint(1, rooms)), samples),
+        ('update_trainer_spec', lambda i: trainer_manager.update_trainer_spec(rng.randint(1, trainers), rng.choice(SPECIALIZATIONS)), samples),
+        ('add_trainers_many', lambda i: trainer_manager.add_trainers_many(trainer_batch(i)), samples),
+        ('add_equipment', lambda i: equipment_manager.add_equipment(f"Новый снаряд {i}", rng.choice(EQUIPMENT_TYPES), 10), samples),
+        ('add_equipment_to_trainer', lambda i: equipment_manager.add_equipment_to_trainer(rng.randint(1, trainers), rng.randint(1, equipment), 1), samples),
+        ('add_equipment_many', lambda i: equipment_manager.add_equipment_many(
+            [(f"Новый снаряд {i}.{j}", rng.choice(EQUIPMENT_TYPES), 10) for j in range(BATCH_SIZE)]), samples),
+        ('assign_equipment_many', lambda i: equipment_manager.assign_equipment_many(
+            [(rng.randint(1, trainers), rng.randint(1, equipment), 1) for _ in range(BATCH_SIZE)]), samples),
+        ('add_room', lambda i: room_manager.add_room(f"Новый зал {i}", "ул. Новая, 1", 20), samples),
+        ('add_rooms_many', lambda i: room_manager.add_rooms_many(
+            [(f"Новый зал {i}.{j}", "ул. Новая, 1", 20) for j in range(BATCH_SIZE)]), samples),
+        ('delete_room', lambda i: room_manager.delete_room(next(new_room_ids)), samples),
+        ('reassign_trainers_room', lambda i: trainer_manager.reassign_trainers_room(
+            rng.randint(1, rooms), rng.randint(1, rooms)), samples),
+        ('delete_trainer', lambda i: trainer_manager.delete_trainer(trainers - i), min(samples, trainers)),
+        ('delete_trainers', lambda i: trainer_manager.delete_trainers(*groups[i]), min(samples, max(1, len(groups) // 2))),
+        ('delete_room_cascade', lambda i: room_manager.delete_room_cascade(rooms - i), min(samples, rooms)),
+    ]
+
+def run_backend(backend, path, sizes, samples, seed):
+    database = Database(path=path)
+    trainer_class, equipment_class, room_class = BACKENDS[backend]
+    managers = (trainer_class(database), equipment_class(database), room_class(database))
+    results = []
+    try:
+        planned = scenarios(*managers, sizes, samples, seed)
+        missing = INTERFACE_METHODS - {method for method, _, _ in planned}
+        if missing:
+            raise ValueError(f"Нет сценариев замера для методов: {', '.join(sorted(missing))}")
+        for method, call, count in planned:
+            result = measure(call, count)
+            result.update(method=method, backend=backend, scale=sizes['trainers'],
+                          batch_size=BATCH_SIZE if method.endswith('_many') else 1)
+            results.append(result)
+            # Сессия ORM не должна копить объекты между сценариями
+            database.remove_session()
+    finally:
+        database.close()
+    return results
+
+def run(scales, backends, samples, seed, workdir=None):
+    results = []
+    with tempfile.TemporaryDirectory(dir=workdir) as directory:
+        for scale in scales:
+            template = os.path.join(directory, f'gym_{scale}.db')
+            database = Database(path=template)
+            started = time.perf_counter()
+            sizes = generate_gym(database, scale, seed)
+            database.close()
+            print(f"Масштаб {scale}: данные сгенерированы за {time.perf_counter() - started:.1f} с", file=sys.stderr)
+            for backend in backends:
+                # Каждый бэкенд работает на своей копии, чтобы записи одного не влияли на другой
+                path = os.path.join(directory, f'gym_{scale}_{backend}.db')
+                _copy_database(template, path)
+                for result in run_backend(backend, path, sizes, samples, seed):
+                    results.append(result)
+                    print(f"{scale:>8} {backend:<6} {result['method']:<32} "
+                          f"{result['ops_per_s'] or 0:>10.1f} оп/с  p50 {result['p50_ms']:.3f} мс  "
+                          f"p95 {result['p95_ms']:.3f} мс  p99 {result['p99_ms']:.3f} мс", file=sys.stderr)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'samples': samples,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+# Копия базы через backup API (корректно и для базы в режиме WAL)
+def _copy_database(source, target):
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+# Сравнение с предыдущим прогоном: возвращает строки, где p50 вырос больше чем в threshold раз
+def compare(baseline, current, threshold):
+    previous = {(r['scale'], r['backend'], r['method']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = previous.get((result['scale'], result['backend'], result['method']))
+        if old and old['p50_ms'] and result['p50_ms'] / old['p50_ms'] > threshold:
+            regressions.append((result, old))
+    return regressions
+
+def _parse_scales(value):
+    return [int(float(scale)) for scale in value.split(',') if scale]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение производительности ORM, DB API и Core реализаций")
+    parser.add_argument('--scales', type=_parse_scales, default=[100, 1000, 10000],
+                        help="масштабы через запятую (число тренеров и закреплений), например 1e2,1e4,1e6")
+    parser.add_argument('--backends', default='orm,dbapi,core', help="бэкенды через запятую: orm, dbapi, core")
+    parser.add_argument('--samples', type=int, default=200, help="число замеров на метод")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=None, help="каталог для временных баз")
+    parser.add_argument('--output', default='-', help="файл для результатов в JSON ('-' - stdout)")
+    parser.add_argument('--compare', default=None, help="JSON предыдущего прогона для поиска регрессий")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="допустимый рост p50 относительно предыдущего прогона")
+    args = parser.parse_args(argv)
+
+    backends = [backend for backend in args.backends.split(',') if backend]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"неизвестные бэкенды: {', '.join(sorted(unknown))}")
+
+    report = run(args.scales, backends, args.samples, args.seed, args.workdir)
+    if args.output == '-':
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for result, old in regressions:
+            print(f"Регрессия: {result['scale']} {result['backend']} {result['method']}: "
+                  f"p50 {old['p50_ms']:.3f} -> {result['p50_ms']:.3f} мс", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,305 @@
+import threading
+import time
+from collections import OrderedDict
+
+from main import DEFAULT_BATCH_SIZE, DEFAULT_PAGE_SIZE, DEFAULT_SEARCH_LIMIT, TrainerManagementBase, EquipmentManagementBase, RoomManagementBase
+
+_MISSING = object()
+
+# LRU-кэш с ограничением по размеру и времени жизни записей.
+# Записи можно помечать тегами, чтобы инвалидировать сразу все ключи,
+# зависящие от одного объекта (например, все списки залов, где есть тренер)
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        # key -> (value, expires_at, tags)
+        self._entries = OrderedDict()
+        # tag -> множество ключей
+        self._tags = {}
+        self._lock = threading.Lock()
+        # Номер поколения растёт при каждой инвалидации. Значение, прочитанное из БД
+        # до инвалидации, не попадёт в кэш (см. set)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    # generation - значение self.generation, взятое до чтения из БД
+    def set(self, key, value, tags=(), generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._entries[key] = (value, self._clock() + self.ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def invalidate_tag(self, *tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+            }
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+# Ключи и теги кэша
+def _room_key(room_id):
+    return ('trainers_by_room', room_id)
+
+def _trainer_equipment_key(trainer_id):
+    return ('trainer_equipment', trainer_id)
+
+def _trainer_tag(trainer_id):
+    return ('trainer', trainer_id)
+
+# Отчёт по загрузке залов зависит от залов, состава тренеров и закреплений,
+# поэтому сбрасывается любой записью, которая их меняет
+_ROOM_UTILIZATION_KEY = ('room_utilization',)
+
+# Общая часть кэширующих обёрток. Обёртка реализует тот же интерфейс, что и
+# оборачиваемый менеджер (ORM, DB API), поэтому подставляется вместо него.
+# Несколько обёрток могут делить один LRUCache, чтобы записи через одну
+# инвалидировали чтения через другую.
+# Закэшированные результаты отдаются как есть - изменять их нельзя
+class _CachedManager:
+    def __init__(self, manager, cache=None):
+        self.manager = manager
+        self.cache = cache if cache is not None else LRUCache()
+
+    def _cached(self, key, load, tags_of=None):
+        value = self.cache.get(key)
+        if value is not _MISSING:
+            return value
+        generation = self.cache.generation
+        value = load()
+        self.cache.set(key, value, tags_of(value) if tags_of else (), generation)
+        return value
+
+class CachedTrainerManagement(_CachedManager, TrainerManagementBase):
+    def add_trainer(self, name, specialization, experience_years, room_id):
+        try:
+            return self.manager.add_trainer(name, specialization, experience_years, room_id)
+        finally:
+            self.cache.invalidate(_room_key(room_id), _ROOM_UTILIZATION_KEY)
+
+    def update_trainer_room(self, trainer_id, new_room_id):
+        try:
+            return self.manager.update_trainer_room(trainer_id, new_room_id)
+        finally:
+            # Старый зал - тот, в списке которого тренер сейчас закэширован
+            self.cache.invalidate_tag(_trainer_tag(trainer_id))
+            self.cache.invalidate(_room_key(new_room_id), _ROOM_UTILIZATION_KEY)
+
+    def update_trainer_spec(self, trainer_id, new_specialization):
+        try:
+            return self.manager.update_trainer_spec(trainer_id, new_specialization)
+        finally:
+            self.cache.invalidate_tag(_trainer_tag(trainer_id))
+
+    def delete_trainer(self, trainer_id):
+        try:
+            return self.manager.delete_trainer(trainer_id)
+        finally:
+            self.cache.invalidate_tag(_trainer_tag(trainer_id))
+            self.cache.invalidate(_trainer_equipment_key(trainer_id), _ROOM_UTILIZATION_KEY)
+
+    def select_trainers_by_room(self, room_id):
+        return self._cached(
+            _room_key(room_id),
+            lambda: self.manager.select_trainers_by_room(room_id),
+            lambda trainers: [_trainer_tag(trainer.id) for trainer in trainers],
+        )
+
+    def add_trainers_many(self, trainers):
+        trainers = list(trainers)
+        try:
+            return self.manager.add_trainers_many(trainers)
+        finally:
+            self.cache.invalidate(*{_room_key(trainer[3]) for trainer in trainers}, _ROOM_UTILIZATION_KEY)
+
+    # Потоковые и постраничные выборки не кэшируются
+    def iter_trainers_by_room(self, room_id, batch_size=DEFAULT_BATCH_SIZE):
+        return self.manager.iter_trainers_by_room(room_id, batch_size)
+
+    def page_trainers_by_room(self, room_id, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        return self.manager.page_trainers_by_room(room_id, page_size, cursor)
+
+    def reassign_trainers_room(self, old_room_id, new_room_id):
+        try:
+            return self.manager.reassign_trainers_room(old_room_id, new_room_id)
+        finally:
+            self.cache.invalidate(_room_key(old_room_id), _room_key(new_room_id), _ROOM_UTILIZATION_KEY)
+
+    # Какие тренеры попали под фильтр, заранее неизвестно, поэтому кэш сбрасывается целиком
+    def delete_trainers(self, specialization=None, room_id=None):
+        try:
+            return self.manager.delete_trainers(specialization, room_id)
+        finally:
+            self.cache.clear()
+
+    # Результаты поиска не кэшируются: запросов много разных, а FTS5 и так быстр
+    def search_trainers(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        return self.manager.search_trainers(text, limit)
+
+class CachedEquipmentManagement(_CachedManager, EquipmentManagementBase):
+    def add_equipment(self, name, type, quantity):
+        return self.manager.add_equipment(name, type, quantity)
+
+    def add_equipment_to_trainer(self, trainer_id, equipment_id, quantity):
+        try:
+            return self.manager.add_equipment_to_trainer(trainer_id, equipment_id, quantity)
+        finally:
+            self.cache.invalidate(_trainer_equipment_key(trainer_id), _ROOM_UTILIZATION_KEY)
+
+    def calculate_trainer_equipment(self, trainer_id):
+        return self._cached(
+            _trainer_equipment_key(trainer_id),
+            lambda: self.manager.calculate_trainer_equipment(trainer_id),
+        )
+
+    def calculate_all_trainer_equipment(self):
+        return self.manager.calculate_all_trainer_equipment()
+
+    def add_equipment_many(self, equipment):
+        return self.manager.add_equipment_many(equipment)
+
+    def assign_equipment_many(self, assignments):
+        assignments = list(assignments)
+        try:
+            return self.manager.assign_equipment_many(assignments)
+        finally:
+            self.cache.invalidate(*{_trainer_equipment_key(assignment[0]) for assignment in assignments},
+                                  _ROOM_UTILIZATION_KEY)
+
+    def iter_trainer_equipment(self, batch_size=DEFAULT_BATCH_SIZE):
+        return self.manager.iter_trainer_equipment(batch_size)
+
+    def page_equipment(self, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        return self.manager.page_equipment(page_size, cursor)
+
+    # Остатки меняются при каждом закреплении, поэтому не кэшируются
+    def get_equipment_availability(self, equipment_id):
+        return self.manager.get_equipment_availability(equipment_id)
+
+    def select_over_allocated_equipment(self):
+        return self.manager.select_over_allocated_equipment()
+
+    def get_trainer_allocated(self, trainer_id):
+        return self.manager.get_trainer_allocated(trainer_id)
+
+    def search_equipment(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        return self.manager.search_equipment(text, limit)
+
+    def select_trainer_equipment(self, trainer_id):
+        return self.manager.select_trainer_equipment(trainer_id)
+
+class CachedRoomManagement(_CachedManager, RoomManagementBase):
+    def add_room(self, name, location, capacity):
+        try:
+            return self.manager.add_room(name, location, capacity)
+        finally:
+            self.cache.invalidate(_ROOM_UTILIZATION_KEY)
+
+    def delete_room(self, room_id):
+        try:
+            return self.manager.delete_room(room_id)
+        finally:
+            # ORM и Core при удалении зала обнуляют room_id у его тренеров
+            self.cache.invalidate(_room_key(room_id), _room_key(None), _ROOM_UTILIZATION_KEY)
+
+    def add_rooms_many(self, rooms):
+        try:
+            return self.manager.add_rooms_many(rooms)
+        finally:
+            self.cache.invalidate(_ROOM_UTILIZATION_KEY)
+
+    def delete_room_cascade(self, room_id):
+        try:
+            return self.manager.delete_room_cascade(room_id)
+        finally:
+            self.cache.clear()
+
+    # Отчёт держится в кэше до записи, меняющей залы, тренеров или закрепления,
+    # или до истечения ttl (записи в обход обёрток кэш не видит). Для этого
+    # обёртки тренеров, оборудования и залов должны делить один LRUCache,
+    # поэтому их создают через cached_managers
+    def room_utilization_report(self):
+        return self._cached(_ROOM_UTILIZATION_KEY, self.manager.room_utilization_report)
+
+    def select_rooms(self):
+        return self.manager.select_rooms()
+
+# Кэширующие обёртки тренеров, оборудования и залов над одним LRUCache (по
+# умолчанию новым): запись через любую из них сбрасывает зависящие от неё
+# чтения через остальные, в том числе room_utilization_report.
+#   trainers, equipment, rooms = cached_managers(TrainerManagementDBAPI(database),
+#                                                EquipmentManagementDBAPI(database),
+#                                                RoomManagementDBAPI(database))
+def cached_managers(trainer_manager, equipment_manager, room_manager, cache=None):
+    cache = cache if cache is not None else LRUCache()
+    return (
+        CachedTrainerManagement(trainer_manager, cache),
+        CachedEquipmentManagement(equipment_manager, cache),
+        CachedRoomManagement(room_manager, cache),
+    )
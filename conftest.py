@@ -0,0 +1,35 @@
+# Общие фикстуры тестов. Файл лежит в корне, чтобы main.py и остальные
+# модули проекта импортировались из тестов без установки пакета
+import pytest
+
+from main import (
+    Base, Database,
+    TrainerManagementORM, EquipmentManagementORM, RoomManagementORM,
+    TrainerManagementDBAPI, EquipmentManagementDBAPI, RoomManagementDBAPI,
+    TrainerManagementCore, EquipmentManagementCore, RoomManagementCore,
+)
+
+# Классы менеджеров (тренеры, оборудование, залы) каждого бэкенда
+BACKENDS = {
+    'orm': (TrainerManagementORM, EquipmentManagementORM, RoomManagementORM),
+    'dbapi': (TrainerManagementDBAPI, EquipmentManagementDBAPI, RoomManagementDBAPI),
+    'core': (TrainerManagementCore, EquipmentManagementCore, RoomManagementCore),
+}
+
+
+# Пустая база во временном каталоге со схемой из моделей (create_all)
+@pytest.fixture
+def database(tmp_path):
+    database = Database(path=str(tmp_path / 'kachalka.db'))
+    Base.metadata.create_all(database.engine)
+    yield database
+    database.close()
+
+
+# Менеджеры (тренеры, оборудование, залы) одного бэкенда над базой database:
+# тест с этой фикстурой выполняется на каждом бэкенде из BACKENDS
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request, database):
+    trainer_class, equipment_class, room_class = BACKENDS[request.param]
+    yield trainer_class(database), equipment_class(database), room_class(database)
+    database.remove_session()
@@ -0,0 +1,282 @@
+# Инструментирование запросов: сколько SQL-запросов выполняет каждый метод менеджера,
+# сколько строк он читает, сколько времени занимает вызов и сами запросы.
+#
+#   recorder = QueryRecorder(slow_query_threshold=0.05)
+#   database = Database(instrumentation=recorder)
+#   equipment_manager = recorder.instrument(EquipmentManagementDBAPI(database))
+#   equipment_manager.calculate_all_trainer_equipment()
+#   recorder.stats()['EquipmentManagementDBAPI.calculate_all_trainer_equipment']
+#
+# ORM: запросы и их время снимаются через события Engine (before/after_cursor_execute).
+# DB API: соединения пула создаются с обёрткой курсора, которая считает запросы,
+# время и прочитанные строки. Прочитанные строки ORM считаются той же обёрткой курсора
+# на соединениях Engine. Запросы дольше slow_query_threshold секунд пишутся в лог.
+# Настройка нового соединения (PRAGMA, первые запросы диалекта SQLAlchemy) не учитывается:
+# соединение начинает считаться после connection_ready
+import contextvars
+import functools
+import inspect
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+logger = logging.getLogger('kachalka.sql')
+
+# Статистика одного вызова метода
+class CallStats:
+    __slots__ = ('statements', 'rows', 'sql_time', 'wall_time')
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.sql_time = 0.0
+        self.wall_time = 0.0
+
+# Накопленная статистика метода по всем вызовам
+class MethodStats:
+    __slots__ = ('calls', 'statements', 'rows', 'sql_time', 'wall_time', 'max_wall_time')
+
+    def __init__(self):
+        self.calls = 0
+        self.statements = 0
+        self.rows = 0
+        self.sql_time = 0.0
+        self.wall_time = 0.0
+        self.max_wall_time = 0.0
+
+    def add(self, call):
+        self.calls += 1
+        self.statements += call.statements
+        self.rows += call.rows
+        self.sql_time += call.sql_time
+        self.wall_time += call.wall_time
+        self.max_wall_time = max(self.max_wall_time, call.wall_time)
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'statements': self.statements,
+            'rows': self.rows,
+            'sql_time': self.sql_time,
+            'wall_time': self.wall_time,
+            'max_wall_time': self.max_wall_time,
+            'statements_per_call': self.statements / self.calls if self.calls else 0.0,
+        }
+
+# Запросы вне инструментированных методов попадают под этим именем
+UNATTRIBUTED = '<unattributed>'
+
+class QueryRecorder:
+    def __init__(self, slow_query_threshold=None, logger=logger):
+        self.slow_query_threshold = slow_query_threshold
+        self.logger = logger
+        self._current = contextvars.ContextVar(f'kachalka_query_call_{id(self)}', default=None)
+        self._methods = {}
+        self._lock = threading.Lock()
+        # Соединения пула DB API: запросы, время и строки
+        self.connection_class = _instrumented_connection_class(self, record_statements=True)
+        # Соединения Engine: только строки, запросы снимают события Engine
+        self.engine_connection_class = _instrumented_connection_class(self, record_statements=False)
+
+    # Подписка на события Engine для ORM-менеджеров. Вызывается после подписки на
+    # настройку соединений: обработчики connect выполняются в порядке подписки,
+    # и последний из них отмечает соединение готовым
+    def listen_engine(self, engine):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('kachalka_query_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info['kachalka_query_started'].pop()
+            if _is_ready(cursor.connection):
+                self.record_statement(statement, parameters, time.perf_counter() - started)
+
+        @event.listens_for(engine, 'connect')
+        def connect(dbapi_connection, connection_record):
+            self.connection_ready(dbapi_connection)
+
+    # Соединение настроено: дальше его запросы и строки относятся к вызовам методов
+    def connection_ready(self, conn):
+        conn.kachalka_ready = True
+
+    def record_statement(self, statement, parameters, duration):
+        call = self._current.get()
+        if call is None:
+            call = CallStats()
+            call.statements, call.sql_time = 1, duration
+            self._add(UNATTRIBUTED, call)
+        else:
+            call.statements += 1
+            call.sql_time += duration
+        if self.slow_query_threshold is not None and duration >= self.slow_query_threshold:
+            self.logger.warning("Медленный запрос (%.1f мс): %s; параметры: %r",
+                                duration * 1000, ' '.join(statement.split()), parameters)
+
+    def record_rows(self, count):
+        call = self._current.get()
+        if call is not None:
+            call.rows += count
+
+    # Учёт всех запросов блока под именем name
+    @contextmanager
+    def track(self, name):
+        call = CallStats()
+        token = self._current.set(call)
+        started = time.perf_counter()
+        try:
+            yield call
+        finally:
+            call.wall_time = time.perf_counter() - started
+            self._current.reset(token)
+            self._add(name, call)
+
+    # Оборачивает публичные методы менеджера (обычные, генераторы, корутины и
+    # асинхронные генераторы), статистика копится под именем '<Класс>.<метод>'.
+    # Возвращает тот же менеджер
+    def instrument(self, manager):
+        # Перебираем функции класса, не трогая свойства (database, session)
+        for name, function in inspect.getmembers(type(manager), inspect.isfunction):
+            if name.startswith('_'):
+                continue
+            setattr(manager, name, self._wrap(f'{type(manager).__name__}.{name}', getattr(manager, name)))
+        return manager
+
+    def _wrap(self, name, method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def wrapper(*args, **kwargs):
+                with self.track(name):
+                    return await method(*args, **kwargs)
+        elif inspect.isasyncgenfunction(method):
+            @functools.wraps(method)
+            async def wrapper(*args, **kwargs):
+                call = CallStats()
+                iterator = method(*args, **kwargs)
+                try:
+                    while True:
+                        token = self._current.set(call)
+                        started = time.perf_counter()
+                        try:
+                            item = await iterator.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        finally:
+                            call.wall_time += time.perf_counter() - started
+                            self._current.reset(token)
+                        yield item
+                finally:
+                    await iterator.aclose()
+                    self._add(name, call)
+        elif inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                return self._track_generator(name, method(*args, **kwargs))
+        else:
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                with self.track(name):
+                    return method(*args, **kwargs)
+        return wrapper
+
+    # Генератор выполняет запросы по мере итерации, поэтому вызов учитывается
+    # шаг за шагом, а в статистику попадает после завершения итерации
+    def _track_generator(self, name, generator):
+        call = CallStats()
+        try:
+            while True:
+                token = self._current.set(call)
+                started = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    call.wall_time += time.perf_counter() - started
+                    self._current.reset(token)
+                yield item
+        finally:
+            generator.close()
+            self._add(name, call)
+
+    def _add(self, name, call):
+        with self._lock:
+            self._methods.setdefault(name, MethodStats()).add(call)
+
+    def stats(self):
+        with self._lock:
+            return {name: method.as_dict() for name, method in self._methods.items()}
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+
+# Соединения не из _instrumented_connection_class считаются готовыми всегда
+def _is_ready(conn):
+    return getattr(conn, 'kachalka_ready', True)
+
+def _instrumented_connection_class(recorder, record_statements):
+    class InstrumentedCursor(sqlite3.Cursor):
+        def execute(self, sql, parameters=()):
+            if not record_statements or not self.connection.kachalka_ready:
+                return super().execute(sql, parameters)
+            started = time.perf_counter()
+            try:
+                return super().execute(sql, parameters)
+            finally:
+                recorder.record_statement(sql, parameters, time.perf_counter() - started)
+
+        def executemany(self, sql, seq_of_parameters):
+            if not record_statements or not self.connection.kachalka_ready:
+                return super().executemany(sql, seq_of_parameters)
+            started = time.perf_counter()
+            try:
+                return super().executemany(sql, seq_of_parameters)
+            finally:
+                recorder.record_statement(sql, '<executemany>', time.perf_counter() - started)
+
+        def fetchone(self):
+            row = super().fetchone()
+            if row is not None:
+                self._record_rows(1)
+            return row
+
+        def fetchmany(self, size=None):
+            rows = super().fetchmany(self.arraysize if size is None else size)
+            self._record_rows(len(rows))
+            return rows
+
+        def fetchall(self):
+            rows = super().fetchall()
+            self._record_rows(len(rows))
+            return rows
+
+        def __next__(self):
+            row = super().__next__()
+            self._record_rows(1)
+            return row
+
+        def _record_rows(self, count):
+            if self.connection.kachalka_ready:
+                recorder.record_rows(count)
+
+    # sqlite3.Connection.execute не вызывает переопределённый cursor(),
+    # поэтому сокращённые методы переопределены явно
+    class InstrumentedConnection(sqlite3.Connection):
+        # До connection_ready запросы настройки соединения не учитываются
+        kachalka_ready = False
+
+        def cursor(self, factory=InstrumentedCursor):
+            return super().cursor(factory)
+
+        def execute(self, sql, parameters=()):
+            return self.cursor().execute(sql, parameters)
+
+        def executemany(self, sql, seq_of_parameters):
+            return self.cursor().executemany(sql, seq_of_parameters)
+
+    return InstrumentedConnection
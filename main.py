@@ -1,22 +1,289 @@
+import asyncio
+import base64
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import queue
+import re
+from collections import namedtuple
 import sqlite3
-
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import (
+    create_engine, event, func, insert, select, update, delete, text, and_, or_, bindparam, make_url,
+    Column, DDL, Integer, String, ForeignKey,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session, relationship
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 
 from abc import ABC, abstractmethod
 
-# ORM настройка
-# В будущем переделать под PostgreSQL или MSSql
-engine = create_engine('sqlite:///kachalka.db')
+# Путь к файлу БД по умолчанию. Переопределяется параметрами configure_database()
+# или переменными окружения KACHALKA_DB_URL (для ORM) и KACHALKA_DB_PATH (для DB API).
+# Явно переданные параметры важнее переменных окружения
+DEFAULT_DB_PATH = 'kachalka.db'
+
+def _sqlite_path(url):
+    database_url = make_url(url)
+    if database_url.get_backend_name() == 'sqlite' and database_url.database:
+        return database_url.database
+    return None
+
+def resolve_database_url(url=None, path=None):
+    if url:
+        return url
+    if path:
+        return f'sqlite:///{path}'
+    if os.environ.get('KACHALKA_DB_URL'):
+        return os.environ['KACHALKA_DB_URL']
+    return f"sqlite:///{os.environ.get('KACHALKA_DB_PATH', DEFAULT_DB_PATH)}"
+
+def resolve_database_path(path=None, url=None):
+    if path:
+        return path
+    # Для SQLite путь к файлу берём из строки подключения ORM
+    if url and _sqlite_path(url):
+        return _sqlite_path(url)
+    if os.environ.get('KACHALKA_DB_PATH'):
+        return os.environ['KACHALKA_DB_PATH']
+    return _sqlite_path(resolve_database_url()) or DEFAULT_DB_PATH
+
+# Настройка каждого нового соединения SQLite (и DB API, и ORM): WAL позволяет
+# читателям работать параллельно с писателем, а busy_timeout заставляет запись
+# ждать освобождения блокировки вместо ошибки "database is locked".
+# Режим WAL записывается в сам файл базы: после первого подключения база остаётся
+# в WAL и для других программ, а рядом с ней появляются файлы -wal и -shm
+def _configure_sqlite_connection(dbapi_connection, busy_timeout):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+    cursor.close()
+
+# Ограниченный пул соединений sqlite3 для DB API-менеджеров. Каждый поток берёт
+# своё соединение на время одного запроса/транзакции, поэтому курсоры разных
+# потоков не перезаписывают друг друга. Если все size соединений заняты,
+# поток ждёт освобождения не дольше timeout секунд
+class SQLiteConnectionPool:
+    def __init__(self, connect, size=5, timeout=30.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f'No free connection in the pool after {self.timeout} s') from None
+
+    def release(self, conn):
+        # Незавершённая транзакция не должна достаться следующему потоку
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    # Закрывает свободные соединения. Занятые в этот момент соединения
+    # возвращаются в пул как обычно
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+# Ленивая фабрика подключений: при импорте модуля ничего не создаётся и файлы
+# не открываются. Engine, сессии ORM и пул соединений DB API создаются при первом обращении.
+# ORM-менеджеры работают через scoped_session (своя сессия у каждого потока),
+# DB API-менеджеры - через SQLiteConnectionPool.
+# instrumentation - необязательный сборщик статистики запросов
+# (см. instrumentation.QueryRecorder), подключается до первого запроса
+class Database:
+    def __init__(self, url=None, path=None, pool_size=5, pool_timeout=30.0, busy_timeout=5000, instrumentation=None):
+        # ORM настройка
+        # В будущем переделать под PostgreSQL или MSSql
+        self.url = resolve_database_url(url, path)
+        # Подключение к базе данных через DB API
+        self.path = resolve_database_path(path, url)
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.busy_timeout = busy_timeout
+        self.instrumentation = instrumentation
+        self._engine = None
+        self._session_factory = None
+        self._read_only_session_factory = None
+        self._session = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    is_sqlite = make_url(self.url).get_backend_name() == 'sqlite'
+                    connect_args = {}
+                    if self.instrumentation is not None and is_sqlite:
+                        connect_args['factory'] = self.instrumentation.engine_connection_class
+                    engine = create_engine(self.url, connect_args=connect_args)
+                    if is_sqlite:
+                        event.listen(
+                            engine, 'connect',
+                            lambda dbapi_connection, _: _configure_sqlite_connection(dbapi_connection, self.busy_timeout),
+                        )
+                    if self.instrumentation is not None:
+                        self.instrumentation.listen_engine(engine)
+                    self._engine = engine
+        return self._engine
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            engine = self.engine
+            with self._lock:
+                if self._session_factory is None:
+                    self._session_factory = sessionmaker(bind=engine)
+        return self._session_factory
+
+    # Фабрика сессий только для чтения (см. SESSION_READ_ONLY): без autoflush,
+    # любая запись через такую сессию отклоняется с ReadOnlySessionError
+    @property
+    def read_only_session_factory(self):
+        if self._read_only_session_factory is None:
+            engine = self.engine
+            with self._lock:
+                if self._read_only_session_factory is None:
+                    factory = sessionmaker(bind=engine, autoflush=False)
+                    event.listen(factory, 'before_flush', _reject_flush)
+                    event.listen(factory, 'do_orm_execute', _reject_write_statement)
+                    self._read_only_session_factory = factory
+        return self._read_only_session_factory
+
+    # Контекстная сессия: каждый поток получает свою Session из реестра
+    @property
+    def session(self):
+        if self._session is None:
+            session_factory = self.session_factory
+            with self._lock:
+                if self._session is None:
+                    self._session = scoped_session(session_factory)
+        return self._session
+
+    # Завершение единицы работы: закрывает сессию текущего потока,
+    # следующий запрос в этом потоке начнётся с новой сессии
+    def remove_session(self):
+        if self._session is not None:
+            self._session.remove()
+
+    # Единица работы (например, обработка одного запроса): все ORM-вызовы потока
+    # внутри блока используют одну сессию, после блока она закрывается вместе
+    # с identity map, незавершённая транзакция откатывается
+    @contextmanager
+    def session_scope(self):
+        try:
+            yield self.session
+        finally:
+            self.remove_session()
+
+    def connect(self):
+        factory = sqlite3.Connection
+        if self.instrumentation is not None:
+            factory = self.instrumentation.connection_class
+        # Путь вида 'file:...?mode=memory&cache=shared' - URI SQLite (например, реплика в памяти)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, check_same_thread=False,
+                               factory=factory, uri=self.path.startswith('file:'))
+        _configure_sqlite_connection(conn, self.busy_timeout)
+        if self.instrumentation is not None:
+            self.instrumentation.connection_ready(conn)
+        return conn
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = SQLiteConnectionPool(self.connect, self.pool_size, self.pool_timeout)
+        return self._pool
+
+    # Соединение DB API из пула на время блока with
+    def connection(self):
+        return self.pool.connection()
+
+    def close(self):
+        if self._session is not None:
+            self._session.remove()
+            self._session = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+            self._session_factory = None
+            self._read_only_session_factory = None
+
+# Запись через сессию только для чтения
+class ReadOnlySessionError(RuntimeError):
+    pass
 
-Base = declarative_base()
+def _reject_flush(session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        raise ReadOnlySessionError('Cannot flush changes in a read-only session')
+
+def _reject_write_statement(orm_execute_state):
+    if not orm_execute_state.is_select:
+        raise ReadOnlySessionError('Cannot execute a write statement in a read-only session')
+
+_database = None
 
-Session = sessionmaker(bind=engine)
-session = Session()
+# Задаёт параметры подключения для менеджеров, созданных без явного database
+def configure_database(url=None, path=None, **options):
+    global _database
+    if _database is not None:
+        _database.close()
+    _database = Database(url, path, **options)
+    return _database
 
-# Подключение к базе данных
-conn = sqlite3.connect('kachalka.db')
-cursor = conn.cursor()
+def get_database():
+    global _database
+    if _database is None:
+        _database = Database()
+    return _database
+
+Base = declarative_base()
 
 # Модели для ORM
 # Модель для сущности "Тренировочный зал"
@@ -39,7 +306,8 @@ class Trainer(Base):
     name = Column(String, nullable=False)
     specialization = Column(String, nullable=False)
     experience_years = Column(Integer)
-    room_id = Column(Integer, ForeignKey('rooms.id'))
+    # Индекс для выборки тренеров по залу (select_trainers_by_room)
+    room_id = Column(Integer, ForeignKey('rooms.id'), index=True)
     # Связь: каждый тренер связан только с одним залом
     room = relationship("Room", back_populates="trainers")
 
@@ -51,7 +319,7 @@ class Equipment(Base):
     __tablename__ = 'equipment'
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
-    type = Column(String, nullable=False)
+    type = Column(String, nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
 
     def __repr__(self):
@@ -63,12 +331,388 @@ class TrainerEquipment(Base):
     # trainer-equipment
     __tablename__ = 'trainer_equipment'
     trainer_id = Column(Integer, ForeignKey('trainers.id'), primary_key=True)
-    equipment_id = Column(Integer, ForeignKey('equipment.id'), primary_key=True)
+    # Составной ключ начинается с trainer_id, поэтому для поиска по
+    # equipment_id нужен отдельный индекс
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), primary_key=True, index=True)
     quantity = Column(Integer, nullable=False)
 
     def __repr__(self):
         return f"({self.trainer_id}, {self.equipment_id}, {self.quantity})"
 
+# Записи результатов выборок. Все бэкенды (ORM, DB API, Core) возвращают эти
+# кортежи вместо объектов моделей или сырых строк: они не привязаны к сессии,
+# одинаковы для всех бэкендов и занимают меньше памяти, чем объект ORM
+RoomRecord = namedtuple('RoomRecord', ['id', 'name', 'location', 'capacity'])
+TrainerRecord = namedtuple('TrainerRecord', ['id', 'name', 'specialization', 'experience_years', 'room_id'])
+EquipmentRecord = namedtuple('EquipmentRecord', ['id', 'name', 'type', 'quantity'])
+TrainerEquipmentRecord = namedtuple('TrainerEquipmentRecord', ['trainer_id', 'equipment_id', 'quantity'])
+
+# Столбцы модели в порядке полей записи: для ORM-запросов только по столбцам
+# и для списков столбцов в SQL
+def _record_columns(model, record_class):
+    return [getattr(model, field) for field in record_class._fields]
+
+# Сводные таблицы закреплённого оборудования: сколько единиц каждого оборудования
+# и сколько единиц у каждого тренера уже закреплено через trainer_equipment.
+# Поддерживаются триггерами на trainer_equipment, поэтому остаток на складе
+# узнаётся по первичному ключу без агрегации всей таблицы закреплений
+class EquipmentAllocation(Base):
+    __tablename__ = 'equipment_allocation'
+    equipment_id = Column(Integer, ForeignKey('equipment.id'), primary_key=True)
+    allocated = Column(Integer, nullable=False, server_default='0')
+
+    def __repr__(self):
+        return f"({self.equipment_id}, {self.allocated})"
+
+class TrainerAllocation(Base):
+    __tablename__ = 'trainer_allocation'
+    trainer_id = Column(Integer, ForeignKey('trainers.id'), primary_key=True)
+    allocated = Column(Integer, nullable=False, server_default='0')
+
+    def __repr__(self):
+        return f"({self.trainer_id}, {self.allocated})"
+
+# Ход импорта transfer.py: сколько записей файла source уже записано в table_name.
+# Обновляется в той же транзакции, что и пакет, поэтому после сбоя импорт
+# продолжается ровно с первого незаписанного пакета
+class ImportCheckpoint(Base):
+    __tablename__ = 'import_checkpoints'
+    source = Column(String, primary_key=True)
+    table_name = Column(String, nullable=False)
+    records = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"('{self.source}', '{self.table_name}', {self.records})"
+
+# Сообщение триггера, отклоняющего закрепление сверх количества на складе
+OVER_ALLOCATION_MESSAGE = 'equipment over-allocated'
+
+# Закрепление превышает количество оборудования на складе
+class EquipmentOverAllocatedError(ValueError):
+    pass
+
+def _is_over_allocation(error):
+    return OVER_ALLOCATION_MESSAGE in str(error)
+
+# Триггеры сводных таблиц. Те же команды выполняет миграция a3c5e1f2b7d4,
+# здесь они подключены к Base.metadata.create_all для новых баз.
+# При upsert SQLite сначала выполняет BEFORE INSERT (NEW.quantity - прибавляемое
+# количество), поэтому одна проверка покрывает и вставку, и увеличение
+ALLOCATION_TRIGGERS = [
+    f"""
+    CREATE TRIGGER trainer_equipment_check_stock BEFORE INSERT ON trainer_equipment
+    WHEN NEW.quantity > 0 AND NEW.quantity >
+        (SELECT quantity FROM equipment WHERE id = NEW.equipment_id)
+        - COALESCE((SELECT allocated FROM equipment_allocation WHERE equipment_id = NEW.equipment_id), 0)
+    BEGIN
+        SELECT RAISE(ABORT, '{OVER_ALLOCATION_MESSAGE}');
+    END
+    """,
+    f"""
+    CREATE TRIGGER trainer_equipment_check_stock_update BEFORE UPDATE OF quantity, equipment_id ON trainer_equipment
+    WHEN NEW.quantity - (CASE WHEN NEW.equipment_id = OLD.equipment_id THEN OLD.quantity ELSE 0 END) > 0
+        AND NEW.quantity - (CASE WHEN NEW.equipment_id = OLD.equipment_id THEN OLD.quantity ELSE 0 END) >
+        (SELECT quantity FROM equipment WHERE id = NEW.equipment_id)
+        - COALESCE((SELECT allocated FROM equipment_allocation WHERE equipment_id = NEW.equipment_id), 0)
+    BEGIN
+        SELECT RAISE(ABORT, '{OVER_ALLOCATION_MESSAGE}');
+    END
+    """,
+    """
+    CREATE TRIGGER trainer_equipment_allocate AFTER INSERT ON trainer_equipment
+    BEGIN
+        INSERT INTO equipment_allocation (equipment_id, allocated) VALUES (NEW.equipment_id, NEW.quantity)
+        ON CONFLICT(equipment_id) DO UPDATE SET allocated = allocated + excluded.allocated;
+        INSERT INTO trainer_allocation (trainer_id, allocated) VALUES (NEW.trainer_id, NEW.quantity)
+        ON CONFLICT(trainer_id) DO UPDATE SET allocated = allocated + excluded.allocated;
+    END
+    """,
+    """
+    CREATE TRIGGER trainer_equipment_reallocate AFTER UPDATE OF trainer_id, equipment_id, quantity ON trainer_equipment
+    BEGIN
+        UPDATE equipment_allocation SET allocated = allocated - OLD.quantity WHERE equipment_id = OLD.equipment_id;
+        UPDATE trainer_allocation SET allocated = allocated - OLD.quantity WHERE trainer_id = OLD.trainer_id;
+        INSERT INTO equipment_allocation (equipment_id, allocated) VALUES (NEW.equipment_id, NEW.quantity)
+        ON CONFLICT(equipment_id) DO UPDATE SET allocated = allocated + excluded.allocated;
+        INSERT INTO trainer_allocation (trainer_id, allocated) VALUES (NEW.trainer_id, NEW.quantity)
+        ON CONFLICT(trainer_id) DO UPDATE SET allocated = allocated + excluded.allocated;
+    END
+    """,
+    """
+    CREATE TRIGGER trainer_equipment_release AFTER DELETE ON trainer_equipment
+    BEGIN
+        UPDATE equipment_allocation SET allocated = allocated - OLD.quantity WHERE equipment_id = OLD.equipment_id;
+        UPDATE trainer_allocation SET allocated = allocated - OLD.quantity WHERE trainer_id = OLD.trainer_id;
+    END
+    """,
+]
+
+for _trigger in ALLOCATION_TRIGGERS:
+    event.listen(TrainerEquipment.__table__, 'after_create', DDL(_trigger).execute_if(dialect='sqlite'))
+
+# Полнотекстовый поиск (SQLite FTS5): trainers_fts по имени и специализации тренера,
+# equipment_fts по названию и типу оборудования; rowid совпадает с id строки.
+# Токенизатор unicode61 приводит к нижнему регистру любые буквы, включая кириллицу,
+# а prefix ускоряет поиск по началу слова. Ё он не сводит к Е, поэтому триггеры
+# пишут в индекс текст с заменой ё на е, то же делает _fts_query с запросом.
+# Те же команды выполняет миграция 5d1e9b7c4f20, здесь они подключены к create_all
+FTS_TABLES = ('trainers_fts', 'equipment_fts')
+
+def _fold_yo(expression):
+    return f"replace(replace({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+def _fts_ddl(table, fts_table, columns):
+    values = ', '.join(_fold_yo(f'NEW.{column}') for column in columns)
+    insert_row = f"INSERT INTO {fts_table} (rowid, {', '.join(columns)}) VALUES (NEW.id, {values});"
+    delete_row = f"DELETE FROM {fts_table} WHERE rowid = OLD.id;"
+    return [
+        f"""
+    CREATE VIRTUAL TABLE {fts_table} USING fts5(
+        {', '.join(columns)}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+        f"""
+    CREATE TRIGGER {fts_table}_insert AFTER INSERT ON {table}
+    BEGIN
+        {insert_row}
+    END
+    """,
+        f"""
+    CREATE TRIGGER {fts_table}_update AFTER UPDATE OF id, {', '.join(columns)} ON {table}
+    BEGIN
+        {delete_row}
+        {insert_row}
+    END
+    """,
+        f"""
+    CREATE TRIGGER {fts_table}_delete AFTER DELETE ON {table}
+    BEGIN
+        {delete_row}
+    END
+    """,
+    ]
+
+SEARCH_DDL = {
+    Trainer.__table__: _fts_ddl('trainers', 'trainers_fts', ['name', 'specialization']),
+    Equipment.__table__: _fts_ddl('equipment', 'equipment_fts', ['name', 'type']),
+}
+
+for _table, _statements in SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(_table, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+# Число результатов поиска по умолчанию
+DEFAULT_SEARCH_LIMIT = 20
+
+_SEARCH_TOKEN = re.compile(r'\w+')
+
+# Запрос FTS5 из пользовательского текста: каждое слово ищется по началу ("пилат"*),
+# все слова должны встретиться. Кавычки и операторы FTS5 из текста не проходят.
+# None, если слов нет
+def _fts_query(text):
+    tokens = _SEARCH_TOKEN.findall(text.replace('ё', 'е').replace('Ё', 'Е'))
+    return ' '.join(f'"{token}"*' for token in tokens) or None
+
+# Результаты по релевантности bm25; совпадение в имени весит вдвое больше.
+# Именованные параметры понимают и sqlite3, и text() SQLAlchemy
+TRAINER_SEARCH_SQL = f"""
+    SELECT {', '.join('t.' + field for field in TrainerRecord._fields)}
+    FROM trainers_fts
+    JOIN trainers t ON t.id = trainers_fts.rowid
+    WHERE trainers_fts MATCH :query
+    ORDER BY bm25(trainers_fts, 2.0, 1.0)
+    LIMIT :limit
+"""
+
+EQUIPMENT_SEARCH_SQL = f"""
+    SELECT {', '.join('e.' + field for field in EquipmentRecord._fields)}
+    FROM equipment_fts
+    JOIN equipment e ON e.id = equipment_fts.rowid
+    WHERE equipment_fts MATCH :query
+    ORDER BY bm25(equipment_fts, 2.0, 1.0)
+    LIMIT :limit
+"""
+
+# Для SQLAlchemy - как SELECT с известными столбцами (в том числе для сессий только для чтения)
+TRAINER_SEARCH = text(TRAINER_SEARCH_SQL).columns(*_record_columns(Trainer.__table__.c, TrainerRecord))
+EQUIPMENT_SEARCH = text(EQUIPMENT_SEARCH_SQL).columns(*_record_columns(Equipment.__table__.c, EquipmentRecord))
+
+# Остаток оборудования: quantity - на складе, allocated - закреплено за тренерами
+EquipmentAvailability = namedtuple('EquipmentAvailability', ['equipment_id', 'quantity', 'allocated', 'available'])
+
+# Загрузка зала: trainers - число тренеров зала, equipment_units - единиц оборудования,
+# закреплённых за ними, load - доля занятых мест (trainers / capacity, None при capacity = 0)
+RoomUtilization = namedtuple('RoomUtilization', ['room_id', 'name', 'capacity', 'trainers', 'equipment_units', 'load'])
+
+# Строка (room_id, name, capacity, trainers, equipment_units) запроса отчёта -> RoomUtilization
+def _room_utilization(row):
+    room_id, name, capacity, trainers, equipment_units = row
+    return RoomUtilization(room_id, name, capacity, trainers, equipment_units, trainers / capacity if capacity else None)
+
+# Атомарное закрепление оборудования за тренером одним запросом:
+# INSERT ... ON CONFLICT(trainer_id, equipment_id) DO UPDATE SET quantity = quantity + excluded.quantity
+# Нет отдельного SELECT и гонки между проверкой и вставкой
+def _trainer_equipment_upsert(dialect_insert):
+    statement = dialect_insert(TrainerEquipment)
+    return statement.on_conflict_do_update(
+        index_elements=[TrainerEquipment.trainer_id, TrainerEquipment.equipment_id],
+        set_={'quantity': TrainerEquipment.quantity + statement.excluded.quantity},
+    )
+
+TRAINER_EQUIPMENT_UPSERT = _trainer_equipment_upsert(sqlite_insert)
+
+# Тот же upsert для диалектов с INSERT ... ON CONFLICT. Для остальных
+# (например, MSSQL) Core-менеджер делает UPDATE и INSERT в одной транзакции
+TRAINER_EQUIPMENT_UPSERTS = {
+    'sqlite': TRAINER_EQUIPMENT_UPSERT,
+    'postgresql': _trainer_equipment_upsert(postgresql_insert),
+}
+
+# Строки (trainer_id, equipment_name, quantity) по всем тренерам, упорядоченные по тренеру
+TRAINER_EQUIPMENT_SQL = """
+    SELECT t.id, e.name, te.quantity
+    FROM trainers t
+    LEFT JOIN trainer_equipment te ON te.trainer_id = t.id
+    LEFT JOIN equipment e ON te.equipment_id = e.id
+    ORDER BY t.id
+"""
+
+# Остаток по сводной таблице: поиск по первичным ключам без обращения к trainer_equipment
+EQUIPMENT_AVAILABILITY_SQL = """
+    SELECT e.id, e.quantity, COALESCE(ea.allocated, 0), e.quantity - COALESCE(ea.allocated, 0)
+    FROM equipment e
+    LEFT JOIN equipment_allocation ea ON ea.equipment_id = e.id
+"""
+
+# Списки столбцов в порядке полей записей
+ROOM_COLUMNS_SQL = ', '.join(RoomRecord._fields)
+TRAINER_COLUMNS_SQL = ', '.join(TrainerRecord._fields)
+EQUIPMENT_COLUMNS_SQL = ', '.join(EquipmentRecord._fields)
+TRAINER_EQUIPMENT_COLUMNS_SQL = ', '.join(TrainerEquipmentRecord._fields)
+
+# Отчёт по загрузке залов одним агрегирующим запросом. Единицы оборудования
+# берутся из сводной trainer_allocation (одна строка на тренера), поэтому
+# соединение не размножает строки тренеров и COUNT не нужен DISTINCT
+ROOM_UTILIZATION_SQL = """
+    SELECT r.id, r.name, r.capacity, COUNT(t.id), COALESCE(SUM(ta.allocated), 0)
+    FROM rooms r
+    LEFT JOIN trainers t ON t.room_id = r.id
+    LEFT JOIN trainer_allocation ta ON ta.trainer_id = t.id
+    GROUP BY r.id, r.name, r.capacity
+    ORDER BY r.id
+"""
+
+TRAINER_EQUIPMENT_UPSERT_SQL = """
+    INSERT INTO trainer_equipment (trainer_id, equipment_id, quantity) VALUES (?, ?, ?)
+    ON CONFLICT(trainer_id, equipment_id) DO UPDATE SET quantity = quantity + excluded.quantity
+"""
+
+# Размер пакета по умолчанию для потоковых (iter_*) методов
+DEFAULT_BATCH_SIZE = 1000
+
+# Группирует строки (trainer_id, equipment_name, quantity), упорядоченные по trainer_id,
+# в пары (ID тренера, {наименование оборудования: количество}) за один проход.
+# В памяти держится только оборудование текущего тренера.
+# Для тренера без оборудования LEFT JOIN возвращает name = NULL, такой тренер
+# получает пустой словарь
+def _iter_grouped_trainer_equipment(rows):
+    current_id, equipment_quantities = None, None
+    for trainer_id, name, quantity in rows:
+        if equipment_quantities is None or trainer_id != current_id:
+            if equipment_quantities is not None:
+                yield current_id, equipment_quantities
+            current_id, equipment_quantities = trainer_id, {}
+        if name is not None:
+            equipment_quantities[name] = quantity
+    if equipment_quantities is not None:
+        yield current_id, equipment_quantities
+
+# Ключ - ID тренера (имена тренеров могут совпадать), значение - словарь
+# {наименование оборудования: количество}
+def _group_trainer_equipment(rows):
+    return dict(_iter_grouped_trainer_equipment(rows))
+
+# Размер страницы по умолчанию для постраничных (page_*) методов
+DEFAULT_PAGE_SIZE = 50
+
+# Курсор страницы для клиента непрозрачен: ID последней выданной записи в base64.
+# Следующая страница выбирается условием id > ID (keyset-пагинация), поэтому
+# дальние страницы стоят столько же, сколько первая, в отличие от OFFSET
+def _encode_page_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps({'after': last_id}).encode()).decode().rstrip('=')
+
+def _decode_page_cursor(cursor):
+    if cursor is None:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded.encode()))['after'])
+    except (ValueError, TypeError, KeyError):
+        raise ValueError(f'Invalid page cursor: {cursor!r}') from None
+
+# Размер страницы проверяется до запроса: при 0 страница не может дать курсор,
+# а отрицательный LIMIT SQLite понимает как отсутствие ограничения
+def _check_page_size(page_size):
+    if not isinstance(page_size, int) or page_size < 1:
+        raise ValueError(f'Invalid page size: {page_size!r}, expected a positive integer')
+
+# Из page_size + 1 прочитанных строк формирует страницу и курсор следующей
+# (None, если страница последняя)
+def _make_page(rows, page_size, id_of):
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, _encode_page_cursor(id_of(rows[-1]))
+
+# row_factory sqlite3: строки курсора сразу создаются записями record_class
+_ROW_FACTORIES = {}
+
+def _execute_records(conn, record_class, query, parameters=()):
+    cursor = conn.execute(query, parameters)
+    factory = _ROW_FACTORIES.get(record_class)
+    if factory is None:
+        factory = _ROW_FACTORIES[record_class] = lambda cursor, row: record_class._make(row)
+    cursor.row_factory = factory
+    return cursor
+
+# Читает курсор DB API пакетами по batch_size строк через fetchmany
+def _fetch_in_batches(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+# Фильтр тренеров для пакетных операций: {столбец: значение} по заданным
+# параметрам. Без фильтра удалились бы все тренеры, поэтому он обязателен
+def _trainer_filters(specialization=None, room_id=None):
+    filters = {
+        column: value
+        for column, value in (('specialization', specialization), ('room_id', room_id))
+        if value is not None
+    }
+    if not filters:
+        raise ValueError('At least one trainer filter is required')
+    return filters
+
+# Пакетная вставка строк (список словарей или один словарь) в таблицу модели одним INSERT
+# (или переданным statement, например upsert) через executemany и одним commit.
+# При ошибке откатывается весь пакет
+def _bulk_insert_orm(session, model, rows, statement=None):
+    if not rows:
+        return
+    try:
+        session.execute(statement if statement is not None else insert(model), rows)
+        session.commit()
+    except IntegrityError as error:
+        session.rollback()
+        if _is_over_allocation(error):
+            raise EquipmentOverAllocatedError(OVER_ALLOCATION_MESSAGE) from error
+        raise
+    except Exception:
+        session.rollback()
+        raise
+
 # Задание 3
 # Интерфейсы с методами для реализации задач из второго задания
 # 1. Интерфейс для управления тренерами
@@ -89,10 +733,48 @@ class TrainerManagementBase(ABC):
     def delete_trainer(self, trainer_id):
         pass
 
+    # Список TrainerRecord тренеров зала
     @abstractmethod
     def select_trainers_by_room(self, room_id):
         pass
 
+    # Пакетное добавление: trainers - итерируемый объект кортежей
+    # (name, specialization, experience_years, room_id), одна транзакция на весь пакет
+    @abstractmethod
+    def add_trainers_many(self, trainers):
+        pass
+
+    # Потоковая выборка тренеров зала: строки читаются из БД пакетами по batch_size,
+    # поэтому расход памяти не зависит от размера таблицы
+    @abstractmethod
+    def iter_trainers_by_room(self, room_id, batch_size=DEFAULT_BATCH_SIZE):
+        pass
+
+    # Страница тренеров зала в порядке ID: (тренеры, курсор следующей страницы или None).
+    # Для первой страницы cursor не передаётся
+    @abstractmethod
+    def page_trainers_by_room(self, room_id, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        pass
+
+    # Перевод всех тренеров зала old_room_id в зал new_room_id одним UPDATE.
+    # Возвращает число переведённых тренеров
+    @abstractmethod
+    def reassign_trainers_room(self, old_room_id, new_room_id):
+        pass
+
+    # Удаление тренеров по фильтру (специализация и/или зал) вместе с их
+    # закреплениями оборудования: по одному DELETE на таблицу в одной транзакции.
+    # Возвращает число удалённых тренеров
+    @abstractmethod
+    def delete_trainers(self, specialization=None, room_id=None):
+        pass
+
+    # Полнотекстовый поиск по имени и специализации без учёта регистра, слова
+    # ищутся по началу: список TrainerRecord по убыванию релевантности
+    @abstractmethod
+    def search_trainers(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        pass
+
 # 2. Интерфейс для управления оборудованием
 class EquipmentManagementBase(ABC):
     @abstractmethod
@@ -111,6 +793,55 @@ class EquipmentManagementBase(ABC):
     def calculate_all_trainer_equipment(self):
         pass
 
+    # Пакетное добавление: equipment - итерируемый объект кортежей (name, type, quantity)
+    @abstractmethod
+    def add_equipment_many(self, equipment):
+        pass
+
+    # Пакетное закрепление: assignments - итерируемый объект кортежей
+    # (trainer_id, equipment_id, quantity), quantity прибавляется к уже закреплённому
+    @abstractmethod
+    def assign_equipment_many(self, assignments):
+        pass
+
+    # Потоковый вариант calculate_all_trainer_equipment: пары
+    # (ID тренера, {наименование оборудования: количество}) в порядке ID тренера
+    @abstractmethod
+    def iter_trainer_equipment(self, batch_size=DEFAULT_BATCH_SIZE):
+        pass
+
+    # Страница списка оборудования в порядке ID: (оборудование, курсор следующей страницы или None)
+    @abstractmethod
+    def page_equipment(self, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        pass
+
+    # Остаток оборудования по сводной таблице: EquipmentAvailability или None,
+    # если оборудования нет. Закрепления сверх остатка (add_equipment_to_trainer,
+    # assign_equipment_many) отклоняются с EquipmentOverAllocatedError
+    @abstractmethod
+    def get_equipment_availability(self, equipment_id):
+        pass
+
+    # Оборудование, закреплённое в количестве больше, чем есть на складе
+    @abstractmethod
+    def select_over_allocated_equipment(self):
+        pass
+
+    # Общее количество единиц оборудования, закреплённых за тренером
+    @abstractmethod
+    def get_trainer_allocated(self, trainer_id):
+        pass
+
+    # Полнотекстовый поиск по названию и типу: список EquipmentRecord по убыванию релевантности
+    @abstractmethod
+    def search_equipment(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        pass
+
+    # Закрепления тренера: список TrainerEquipmentRecord в порядке ID оборудования
+    @abstractmethod
+    def select_trainer_equipment(self, trainer_id):
+        pass
+
 # 3. Интерфейс для управления залами
 class RoomManagementBase(ABC):
     @abstractmethod
@@ -121,84 +852,260 @@ class RoomManagementBase(ABC):
     def delete_room(self, room_id):
         pass
 
+    # Пакетное добавление: rooms - итерируемый объект кортежей (name, location, capacity)
+    @abstractmethod
+    def add_rooms_many(self, rooms):
+        pass
+
+    # Удаление зала вместе с его тренерами и их закреплениями оборудования
+    # в одной транзакции. Возвращает число удалённых тренеров
+    @abstractmethod
+    def delete_room_cascade(self, room_id):
+        pass
+
+    # Загрузка всех залов (список RoomUtilization в порядке ID) одним запросом.
+    # Для частых опросов (дашборды) есть кэширующие обёртки cache.cached_managers
+    @abstractmethod
+    def room_utilization_report(self):
+        pass
+
+    # Список RoomRecord всех залов в порядке ID
+    @abstractmethod
+    def select_rooms(self):
+        pass
+
 # Реализации интерфейсов с решением поставленных задач через SQLAlchemy ORM
-class TrainerManagementORM(TrainerManagementBase):
+# Общая часть всех менеджеров: подключение (Database) передаётся в конструктор,
+# по умолчанию используется get_database(). Ничего не открывается до первого запроса
+class _DatabaseManager:
+    def __init__(self, database=None):
+        self._database = database
+
+    @property
+    def database(self):
+        if self._database is None:
+            self._database = get_database()
+        return self._database
+
+# Режимы жизни сессии ORM-менеджера:
+# scoped - сессия потока (Database.session) живёт до Database.remove_session() или
+#     конца блока Database.session_scope(), загруженные объекты копятся в её identity map;
+# bounded - та же сессия, но после каждого вызова метода менеджера все объекты
+#     удаляются из неё (expunge_all), возвращённые объекты отсоединены от сессии;
+# read_only - каждый вызов выполняется в своей сессии только для чтения, которая
+#     закрывается по его завершении. Объекты не отслеживаются, запись отклоняется.
+# У отсоединённых объектов доступны загруженные столбцы, но не ленивые связи (room, trainers)
+SESSION_SCOPED = 'scoped'
+SESSION_BOUNDED = 'bounded'
+SESSION_READ_ONLY = 'read_only'
+
+class _ORMManager(_DatabaseManager):
+    def __init__(self, database=None, session_mode=SESSION_SCOPED):
+        super().__init__(database)
+        if session_mode not in (SESSION_SCOPED, SESSION_BOUNDED, SESSION_READ_ONLY):
+            raise ValueError(f'Unknown session mode: {session_mode!r}')
+        self.session_mode = session_mode
+        self._call_session = contextvars.ContextVar(f'kachalka_call_session_{id(self)}', default=None)
+        if session_mode != SESSION_SCOPED:
+            # Перебираем функции класса, не трогая свойства (database, session)
+            for name, function in inspect.getmembers(type(self), inspect.isfunction):
+                if not name.startswith('_'):
+                    setattr(self, name, self._bounded(getattr(self, name)))
+
+    # Сессия текущего вызова в режиме read_only, иначе сессия потока (scoped_session)
+    @property
+    def session(self):
+        session = self._call_session.get()
+        return session if session is not None else self.database.session
+
+    # Оборачивает метод так, чтобы вызов (для генератора - вся итерация) не оставлял
+    # объектов в сессии. Генератор выполняется по шагам, и сессия вызова
+    # подставляется только на время шага
+    def _bounded(self, method):
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                session = self._open_call_session()
+                generator = method(*args, **kwargs)
+                try:
+                    while True:
+                        token = self._call_session.set(session)
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            self._call_session.reset(token)
+                        yield item
+                finally:
+                    generator.close()
+                    self._close_call_session(session)
+        else:
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                session = self._open_call_session()
+                token = self._call_session.set(session)
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self._call_session.reset(token)
+                    self._close_call_session(session)
+        return wrapper
+
+    def _open_call_session(self):
+        if self.session_mode == SESSION_READ_ONLY:
+            return self.database.read_only_session_factory()
+        return None
+
+    def _close_call_session(self, session):
+        if session is not None:
+            session.close()
+        else:
+            self.database.session.expunge_all()
+
+# Удаляет тренеров по фильтру {столбец: значение} и их закрепления, по одному
+# DELETE на таблицу. Триггеры trainer_equipment уменьшают сводные таблицы,
+# после чего строки тренеров удаляются и из trainer_allocation. Commit - за вызывающим
+def _delete_trainers_orm(session, filters):
+    trainer_ids = select(Trainer.id).filter_by(**filters)
+    session\
+        .query(TrainerEquipment)\
+        .filter(TrainerEquipment.trainer_id.in_(trainer_ids))\
+        .delete(synchronize_session=False)
+    session\
+        .query(TrainerAllocation)\
+        .filter(TrainerAllocation.trainer_id.in_(trainer_ids))\
+        .delete(synchronize_session=False)
+    return session\
+            .query(Trainer)\
+            .filter_by(**filters)\
+            .delete()
+
+class TrainerManagementORM(_ORMManager, TrainerManagementBase):
     def add_trainer(self, name, specialization, experience_years, room_id):
         # Создаём экземпляр класса Trainer
         new_trainer = Trainer(name=name, specialization=specialization, experience_years=experience_years, room_id=room_id)
         # Добавляем его в БД
-        session.add(new_trainer)
-        session.commit()
+        self.session.add(new_trainer)
+        self.session.commit()
 
     def update_trainer_room(self, trainer_id, new_room_id):
         # Ищем тренера по Id
-        trainer = session\
+        trainer = self.session\
                     .query(Trainer)\
                     .filter(Trainer.id == trainer_id)\
                     .first()
         # Если находим тренера, то меняем его зал
         if trainer:
             trainer.room_id = new_room_id
-            session.commit()
+            self.session.commit()
     
     def update_trainer_spec(self, trainer_id, new_specialization):
         # Ищем тренера по Id
-        trainer = session\
+        trainer = self.session\
                     .query(Trainer)\
                     .filter(Trainer.id == trainer_id)\
                     .first()
         # Если находим тренера, то меняем его специализацию
         if trainer:
             trainer.specialization = new_specialization
-            session.commit()
+            self.session.commit()
     
     def delete_trainer(self, trainer_id):
         # Ищем тренера по Id
-        trainer = session\
+        trainer = self.session\
                     .query(Trainer)\
                     .filter(Trainer.id == trainer_id)\
                     .first()
         # Если находим тренера, то удаляем запись о нём
         if trainer:
-            session.delete(trainer)
-            session.commit()
+            self.session.delete(trainer)
+            self.session.commit()
 
     def select_trainers_by_room(self, room_id):
-        # Поиск всех тренеров, у которых зал соответсвует переданному параметру
-        trainers = session\
-                    .query(Trainer)\
+        # Поиск всех тренеров, у которых зал соответсвует переданному параметру.
+        # Запрос только по столбцам: объекты Trainer не создаются и не попадают в сессию
+        trainers = self.session\
+                    .query(*_record_columns(Trainer, TrainerRecord))\
                     .filter(Trainer.room_id == room_id)\
                     .all()
-        return trainers
+        return [TrainerRecord._make(trainer) for trainer in trainers]
+
+    def add_trainers_many(self, trainers):
+        rows = [
+            dict(name=name, specialization=specialization, experience_years=experience_years, room_id=room_id)
+            for name, specialization, experience_years, room_id in trainers
+        ]
+        # Один INSERT через executemany и один commit на весь пакет
+        _bulk_insert_orm(self.session, Trainer, rows)
+
+    def iter_trainers_by_room(self, room_id, batch_size=DEFAULT_BATCH_SIZE):
+        # yield_per загружает строки пакетами вместо всего результата сразу
+        rows = self.session\
+                .query(*_record_columns(Trainer, TrainerRecord))\
+                .filter(Trainer.room_id == room_id)\
+                .yield_per(batch_size)
+        for row in rows:
+            yield TrainerRecord._make(row)
+
+    def page_trainers_by_room(self, room_id, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        _check_page_size(page_size)
+        query = self.session\
+                    .query(*_record_columns(Trainer, TrainerRecord))\
+                    .filter(Trainer.room_id == room_id)
+        after_id = _decode_page_cursor(cursor)
+        if after_id is not None:
+            query = query.filter(Trainer.id > after_id)
+        # Лишняя строка показывает, есть ли следующая страница
+        trainers = query.order_by(Trainer.id).limit(page_size + 1).all()
+        return _make_page([TrainerRecord._make(trainer) for trainer in trainers], page_size, lambda trainer: trainer.id)
+
+    def reassign_trainers_room(self, old_room_id, new_room_id):
+        # UPDATE по условию без загрузки тренеров в сессию
+        try:
+            count = self.session\
+                        .query(Trainer)\
+                        .filter(Trainer.room_id == old_room_id)\
+                        .update({Trainer.room_id: new_room_id})
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return count
+
+    def delete_trainers(self, specialization=None, room_id=None):
+        filters = _trainer_filters(specialization, room_id)
+        try:
+            count = _delete_trainers_orm(self.session, filters)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return count
+
+    def search_trainers(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        query = _fts_query(text)
+        if query is None:
+            return []
+        rows = self.session.execute(TRAINER_SEARCH, dict(query=query, limit=limit))
+        return [TrainerRecord._make(row) for row in rows]
             
-class EquipmentManagementORM(EquipmentManagementBase):
+class EquipmentManagementORM(_ORMManager, EquipmentManagementBase):
     def add_equipment(self, name, type, quantity):
         # Создаём экземпляр класса Equipment
         new_equipment = Equipment(name=name, type=type, quantity=quantity)
-        session.add(new_equipment)
+        self.session.add(new_equipment)
         # Добавляем его в БД
-        session.commit()
+        self.session.commit()
 
     def add_equipment_to_trainer(self, trainer_id, equipment_id, quantity):
-        # Ищем запись о закреплённом за тренером оборудовании
-        existing_entry = session\
-                            .query(TrainerEquipment)\
-                            .filter_by(trainer_id=trainer_id, equipment_id=equipment_id)\
-                            .first()
-        # Если запись найдена, то суммируем поле quantity с переданным значением
-        if existing_entry:
-            # Изменения данных в записи отслеживаются
-            existing_entry.quantity += quantity
-        # Иначе создаём новую запись в БД
-        else:
-            new_trainer_equipment = TrainerEquipment(trainer_id=trainer_id, equipment_id=equipment_id, quantity=quantity)
-            session.add(new_trainer_equipment)
-        # Сохраняем изменения в БД
-        session.commit()
+        row = dict(trainer_id=trainer_id, equipment_id=equipment_id, quantity=quantity)
+        # Создаём запись или суммируем quantity с уже закреплённым одним запросом
+        self._upsert_trainer_equipment([row])
 
     def calculate_trainer_equipment(self, trainer_id):
         # Ищем все записи для тренера об используемом им оборудовании
-        equipment_list = session\
+        equipment_list = self.session\
                             .query(TrainerEquipment, Equipment)\
                             .join(Equipment, TrainerEquipment.equipment_id == Equipment.id)\
                             .filter(TrainerEquipment.trainer_id == trainer_id)\
@@ -213,82 +1120,260 @@ class EquipmentManagementORM(EquipmentManagementBase):
     
     def calculate_all_trainer_equipment(self):
         # Словарь, где ключи - ID тренера, значения - словарь с названиями оборудования и их количеством
-        all_trainer_equipment = {}
-        trainers = session.query(Trainer).all()  # Получаем всех тренеров из базы данных
-        # Заполняем словарь
-        for trainer in trainers:
-            equipment_quantities = self.calculate_trainer_equipment(trainer.id)
-            all_trainer_equipment[trainer.name] = equipment_quantities
-
-        return all_trainer_equipment
+        # Один запрос: LEFT JOIN, чтобы в результат попали и тренеры без оборудования
+        return _group_trainer_equipment(self._trainer_equipment_query().all())
+
+    def iter_trainer_equipment(self, batch_size=DEFAULT_BATCH_SIZE):
+        yield from _iter_grouped_trainer_equipment(self._trainer_equipment_query().yield_per(batch_size))
+
+    def page_equipment(self, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        _check_page_size(page_size)
+        query = self.session.query(*_record_columns(Equipment, EquipmentRecord))
+        after_id = _decode_page_cursor(cursor)
+        if after_id is not None:
+            query = query.filter(Equipment.id > after_id)
+        equipment = query.order_by(Equipment.id).limit(page_size + 1).all()
+        return _make_page([EquipmentRecord._make(eq) for eq in equipment], page_size, lambda eq: eq.id)
+
+    def get_equipment_availability(self, equipment_id):
+        row = self._availability_query()\
+                .filter(Equipment.id == equipment_id)\
+                .first()
+        return EquipmentAvailability(*row) if row else None
+
+    def select_over_allocated_equipment(self):
+        allocated = func.coalesce(EquipmentAllocation.allocated, 0)
+        rows = self._availability_query()\
+                .filter(allocated > Equipment.quantity)\
+                .order_by(Equipment.id)\
+                .all()
+        return [EquipmentAvailability(*row) for row in rows]
+
+    def get_trainer_allocated(self, trainer_id):
+        allocated = self.session\
+                        .query(TrainerAllocation.allocated)\
+                        .filter(TrainerAllocation.trainer_id == trainer_id)\
+                        .scalar()
+        return allocated or 0
+
+    def search_equipment(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        query = _fts_query(text)
+        if query is None:
+            return []
+        rows = self.session.execute(EQUIPMENT_SEARCH, dict(query=query, limit=limit))
+        return [EquipmentRecord._make(row) for row in rows]
+
+    def select_trainer_equipment(self, trainer_id):
+        rows = self.session\
+                .query(*_record_columns(TrainerEquipment, TrainerEquipmentRecord))\
+                .filter(TrainerEquipment.trainer_id == trainer_id)\
+                .order_by(TrainerEquipment.equipment_id)\
+                .all()
+        return [TrainerEquipmentRecord._make(row) for row in rows]
+
+    def _availability_query(self):
+        allocated = func.coalesce(EquipmentAllocation.allocated, 0)
+        return self.session\
+                .query(Equipment.id, Equipment.quantity, allocated, Equipment.quantity - allocated)\
+                .outerjoin(EquipmentAllocation, EquipmentAllocation.equipment_id == Equipment.id)
+
+    # Строки (trainer_id, equipment_name, quantity) по всем тренерам, упорядоченные по тренеру
+    def _trainer_equipment_query(self):
+        return self.session\
+                .query(Trainer.id, Equipment.name, TrainerEquipment.quantity)\
+                .outerjoin(TrainerEquipment, TrainerEquipment.trainer_id == Trainer.id)\
+                .outerjoin(Equipment, TrainerEquipment.equipment_id == Equipment.id)\
+                .order_by(Trainer.id)
+
+    def add_equipment_many(self, equipment):
+        rows = [dict(name=name, type=type, quantity=quantity) for name, type, quantity in equipment]
+        _bulk_insert_orm(self.session, Equipment, rows)
+
+    def assign_equipment_many(self, assignments):
+        rows = [
+            dict(trainer_id=trainer_id, equipment_id=equipment_id, quantity=quantity)
+            for trainer_id, equipment_id, quantity in assignments
+        ]
+        # Тот же upsert через executemany, повторные пары в пакете суммируются
+        self._upsert_trainer_equipment(rows)
+
+    # Закрепление пакета одним commit: upsert диалекта сессии через executemany,
+    # а без ON CONFLICT - UPDATE и INSERT для строк, которых ещё нет
+    def _upsert_trainer_equipment(self, rows):
+        upsert = TRAINER_EQUIPMENT_UPSERTS.get(self.session.get_bind().dialect.name)
+        if upsert is not None:
+            _bulk_insert_orm(self.session, TrainerEquipment, rows, upsert)
+            return
+        if not rows:
+            return
+        try:
+            with _over_allocation_errors_core():
+                _add_trainer_equipment_rows(self.session.execute, rows)
+                self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
     
-class RoomManagementORM(RoomManagementBase):
+class RoomManagementORM(_ORMManager, RoomManagementBase):
     def add_room(self, name, location, capacity):
         # Создаём экземпляр класса Equipment
         new_room = Room(name=name, location=location, capacity=capacity)
         # Добавляем его в БД
-        session.add(new_room)
-        session.commit()
+        self.session.add(new_room)
+        self.session.commit()
 
     def delete_room(self, room_id):
         # Ищем запись о зале по Id
-        room = session\
+        room = self.session\
                 .query(Room)\
                 .filter(Room.id == room_id)\
                 .first()
         # Если находим зал, то удаляем его
         if room:
-            session.delete(room)
-            session.commit()
+            self.session.delete(room)
+            self.session.commit()
+
+    def add_rooms_many(self, rooms):
+        rows = [dict(name=name, location=location, capacity=capacity) for name, location, capacity in rooms]
+        _bulk_insert_orm(self.session, Room, rows)
+
+    def delete_room_cascade(self, room_id):
+        try:
+            count = _delete_trainers_orm(self.session, {'room_id': room_id})
+            self.session\
+                .query(Room)\
+                .filter(Room.id == room_id)\
+                .delete()
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return count
+
+    def room_utilization_report(self):
+        rows = self.session\
+                .query(Room.id, Room.name, Room.capacity, func.count(Trainer.id),
+                       func.coalesce(func.sum(TrainerAllocation.allocated), 0))\
+                .outerjoin(Trainer, Trainer.room_id == Room.id)\
+                .outerjoin(TrainerAllocation, TrainerAllocation.trainer_id == Trainer.id)\
+                .group_by(Room.id, Room.name, Room.capacity)\
+                .order_by(Room.id)\
+                .all()
+        return [_room_utilization(row) for row in rows]
+
+    def select_rooms(self):
+        rows = self.session\
+                .query(*_record_columns(Room, RoomRecord))\
+                .order_by(Room.id)\
+                .all()
+        return [RoomRecord._make(row) for row in rows]
 
 # Реализации интерфейсов с решением поставленных задач через DB API 2.0
-class TrainerManagementDBAPI(TrainerManagementBase):
+# Ошибка триггера остатков из sqlite3 превращается в EquipmentOverAllocatedError
+@contextmanager
+def _over_allocation_errors():
+    try:
+        yield
+    except sqlite3.IntegrityError as error:
+        if _is_over_allocation(error):
+            raise EquipmentOverAllocatedError(OVER_ALLOCATION_MESSAGE) from error
+        raise
+
+class _DBAPIManager(_DatabaseManager):
+    # Соединение из пула на время одного вызова метода
+    def _connection(self):
+        return self.database.connection()
+
+# DB API-вариант _delete_trainers_orm на соединении conn внутри транзакции.
+# Имена столбцов берутся только из _trainer_filters, значения передаются параметрами
+def _delete_trainers_dbapi(conn, filters):
+    where = ' AND '.join(f'{column} = ?' for column in filters)
+    parameters = tuple(filters.values())
+    trainer_ids = f"SELECT id FROM trainers WHERE {where}"
+    conn.execute(f"DELETE FROM trainer_equipment WHERE trainer_id IN ({trainer_ids})", parameters)
+    conn.execute(f"DELETE FROM trainer_allocation WHERE trainer_id IN ({trainer_ids})", parameters)
+    return conn.execute(f"DELETE FROM trainers WHERE {where}", parameters).rowcount
+
+class TrainerManagementDBAPI(_DBAPIManager, TrainerManagementBase):
     def add_trainer(self, name, specialization, experience_years, room_id):
         query = "INSERT INTO trainers (name, specialization, experience_years, room_id) VALUES (?, ?, ?, ?)"
-        cursor.execute(query, (name, specialization, experience_years, room_id))
-        conn.commit()
+        with self._connection() as conn:
+            conn.execute(query, (name, specialization, experience_years, room_id))
+            conn.commit()
 
     def update_trainer_room(self, trainer_id, new_room_id):
         query = "UPDATE trainers SET room_id = ? WHERE id = ?"
-        cursor.execute(query, (new_room_id, trainer_id))
-        conn.commit()
+        with self._connection() as conn:
+            conn.execute(query, (new_room_id, trainer_id))
+            conn.commit()
 
     def update_trainer_spec(self, trainer_id, new_specialization):
         query = "UPDATE trainers SET specialization = ? WHERE id = ?"
-        cursor.execute(query, (new_specialization, trainer_id))
-        conn.commit()
+        with self._connection() as conn:
+            conn.execute(query, (new_specialization, trainer_id))
+            conn.commit()
 
     def delete_trainer(self, trainer_id):
         query = "DELETE FROM trainers WHERE id = ?"
-        cursor.execute(query, (trainer_id,))
-        conn.commit()
+        with self._connection() as conn:
+            conn.execute(query, (trainer_id,))
+            conn.commit()
 
     def select_trainers_by_room(self, room_id):
-        query = "SELECT * FROM trainers WHERE room_id = ?"
-        cursor.execute(query, (room_id,))
-        return cursor.fetchall()
+        query = f"SELECT {TRAINER_COLUMNS_SQL} FROM trainers WHERE room_id = ?"
+        with self._connection() as conn:
+            return _execute_records(conn, TrainerRecord, query, (room_id,)).fetchall()
 
-class EquipmentManagementDBAPI(EquipmentManagementBase):
+    def add_trainers_many(self, trainers):
+        query = "INSERT INTO trainers (name, specialization, experience_years, room_id) VALUES (?, ?, ?, ?)"
+        # Контекстный менеджер соединения: commit при успехе, rollback при ошибке
+        with self._connection() as conn, conn:
+            conn.executemany(query, trainers)
+
+    def iter_trainers_by_room(self, room_id, batch_size=DEFAULT_BATCH_SIZE):
+        query = f"SELECT {TRAINER_COLUMNS_SQL} FROM trainers WHERE room_id = ?"
+        # Соединение занято, пока генератор не исчерпан или не закрыт
+        with self._connection() as conn:
+            yield from _fetch_in_batches(_execute_records(conn, TrainerRecord, query, (room_id,)), batch_size)
+
+    def page_trainers_by_room(self, room_id, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        _check_page_size(page_size)
+        # Индекс ix_trainers_room_id хранит и rowid (id), поэтому условие и
+        # сортировка по id обслуживаются им без сортировки в памяти
+        query = f"SELECT {TRAINER_COLUMNS_SQL} FROM trainers WHERE room_id = ? AND id > ? ORDER BY id LIMIT ?"
+        after_id = _decode_page_cursor(cursor)
+        parameters = (room_id, after_id if after_id is not None else -1, page_size + 1)
+        with self._connection() as conn:
+            rows = _execute_records(conn, TrainerRecord, query, parameters).fetchall()
+        return _make_page(rows, page_size, lambda row: row.id)
+
+    def reassign_trainers_room(self, old_room_id, new_room_id):
+        query = "UPDATE trainers SET room_id = ? WHERE room_id = ?"
+        with self._connection() as conn, conn:
+            return conn.execute(query, (new_room_id, old_room_id)).rowcount
+
+    def delete_trainers(self, specialization=None, room_id=None):
+        filters = _trainer_filters(specialization, room_id)
+        with self._connection() as conn, conn:
+            return _delete_trainers_dbapi(conn, filters)
+
+    def search_trainers(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        query = _fts_query(text)
+        if query is None:
+            return []
+        with self._connection() as conn:
+            return _execute_records(conn, TrainerRecord, TRAINER_SEARCH_SQL, dict(query=query, limit=limit)).fetchall()
+
+class EquipmentManagementDBAPI(_DBAPIManager, EquipmentManagementBase):
     def add_equipment(self, name, type, quantity):
         query = "INSERT INTO equipment (name, type, quantity) VALUES (?, ?, ?)"
-        cursor.execute(query, (name, type, quantity))
-        conn.commit()
+        with self._connection() as conn:
+            conn.execute(query, (name, type, quantity))
+            conn.commit()
 
     def add_equipment_to_trainer(self, trainer_id, equipment_id, quantity):
-        # Check if entry exists
-        query_check = "SELECT quantity FROM trainer_equipment WHERE trainer_id = ? AND equipment_id = ?"
-        cursor.execute(query_check, (trainer_id, equipment_id))
-        existing_entry = cursor.fetchone()
-
-        if existing_entry:
-            new_quantity = existing_entry[0] + quantity
-            query = "UPDATE trainer_equipment SET quantity = ? WHERE trainer_id = ? AND equipment_id = ?"
-            cursor.execute(query, (new_quantity, trainer_id, equipment_id))
-        else:
-            query = "INSERT INTO trainer_equipment (trainer_id, equipment_id, quantity) VALUES (?, ?, ?)"
-            cursor.execute(query, (trainer_id, equipment_id, quantity))
-        conn.commit()
-
+        with self._connection() as conn, _over_allocation_errors(), conn:
+            conn.execute(TRAINER_EQUIPMENT_UPSERT_SQL, (trainer_id, equipment_id, quantity))
 
     def calculate_trainer_equipment(self, trainer_id):
         query = """
@@ -297,8 +1382,8 @@ class EquipmentManagementDBAPI(EquipmentManagementBase):
             JOIN equipment e ON te.equipment_id = e.id
             WHERE te.trainer_id = ?
         """
-        cursor.execute(query, (trainer_id,))
-        results = cursor.fetchall()
+        with self._connection() as conn:
+            results = conn.execute(query, (trainer_id,)).fetchall()
         total_equipment = {}
         for name, quantity in results:
             total_equipment[name] = quantity
@@ -306,75 +1391,624 @@ class EquipmentManagementDBAPI(EquipmentManagementBase):
     
     def calculate_all_trainer_equipment(self):
         # Словарь, где ключи - ID тренера, значения - словарь с названиями оборудования и их количеством
-        all_trainer_equipment = {}
-        trainers = session.query(Trainer).all()  # Получаем всех тренеров из базы данных
-        # Заполняем словарь
-        for trainer in trainers:
-            equipment_quantities = self.calculate_trainer_equipment(trainer.id)
-            all_trainer_equipment[trainer.name] = equipment_quantities
+        with self._connection() as conn:
+            return _group_trainer_equipment(conn.execute(TRAINER_EQUIPMENT_SQL))
+
+    def iter_trainer_equipment(self, batch_size=DEFAULT_BATCH_SIZE):
+        with self._connection() as conn:
+            rows = _fetch_in_batches(conn.execute(TRAINER_EQUIPMENT_SQL), batch_size)
+            yield from _iter_grouped_trainer_equipment(rows)
+
+    def page_equipment(self, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        _check_page_size(page_size)
+        query = f"SELECT {EQUIPMENT_COLUMNS_SQL} FROM equipment WHERE id > ? ORDER BY id LIMIT ?"
+        after_id = _decode_page_cursor(cursor)
+        parameters = (after_id if after_id is not None else -1, page_size + 1)
+        with self._connection() as conn:
+            rows = _execute_records(conn, EquipmentRecord, query, parameters).fetchall()
+        return _make_page(rows, page_size, lambda row: row.id)
+
+    def get_equipment_availability(self, equipment_id):
+        query = EQUIPMENT_AVAILABILITY_SQL + " WHERE e.id = ?"
+        with self._connection() as conn:
+            row = conn.execute(query, (equipment_id,)).fetchone()
+        return EquipmentAvailability(*row) if row else None
+
+    def select_over_allocated_equipment(self):
+        query = EQUIPMENT_AVAILABILITY_SQL + " WHERE COALESCE(ea.allocated, 0) > e.quantity ORDER BY e.id"
+        with self._connection() as conn:
+            return [EquipmentAvailability(*row) for row in conn.execute(query)]
+
+    def get_trainer_allocated(self, trainer_id):
+        query = "SELECT allocated FROM trainer_allocation WHERE trainer_id = ?"
+        with self._connection() as conn:
+            row = conn.execute(query, (trainer_id,)).fetchone()
+        return row[0] if row else 0
+
+    def search_equipment(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        query = _fts_query(text)
+        if query is None:
+            return []
+        with self._connection() as conn:
+            return _execute_records(conn, EquipmentRecord, EQUIPMENT_SEARCH_SQL, dict(query=query, limit=limit)).fetchall()
+
+    def select_trainer_equipment(self, trainer_id):
+        query = f"SELECT {TRAINER_EQUIPMENT_COLUMNS_SQL} FROM trainer_equipment WHERE trainer_id = ? ORDER BY equipment_id"
+        with self._connection() as conn:
+            return _execute_records(conn, TrainerEquipmentRecord, query, (trainer_id,)).fetchall()
+
+    def add_equipment_many(self, equipment):
+        query = "INSERT INTO equipment (name, type, quantity) VALUES (?, ?, ?)"
+        with self._connection() as conn, conn:
+            conn.executemany(query, equipment)
 
-        return all_trainer_equipment
+    def assign_equipment_many(self, assignments):
+        with self._connection() as conn, _over_allocation_errors(), conn:
+            conn.executemany(TRAINER_EQUIPMENT_UPSERT_SQL, assignments)
 
-class RoomManagementDBAPI(RoomManagementBase):
+class RoomManagementDBAPI(_DBAPIManager, RoomManagementBase):
     def add_room(self, name, location, capacity):
         query = "INSERT INTO rooms (name, location, capacity) VALUES (?, ?, ?)"
-        cursor.execute(query, (name, location, capacity))
-        conn.commit()
+        with self._connection() as conn:
+            conn.execute(query, (name, location, capacity))
+            conn.commit()
 
     def delete_room(self, room_id):
         query = "DELETE FROM rooms WHERE id = ?"
-        cursor.execute(query, (room_id,))
-        conn.commit()
+        with self._connection() as conn:
+            conn.execute(query, (room_id,))
+            conn.commit()
+
+    def add_rooms_many(self, rooms):
+        query = "INSERT INTO rooms (name, location, capacity) VALUES (?, ?, ?)"
+        with self._connection() as conn, conn:
+            conn.executemany(query, rooms)
+
+    def delete_room_cascade(self, room_id):
+        with self._connection() as conn, conn:
+            count = _delete_trainers_dbapi(conn, {'room_id': room_id})
+            conn.execute("DELETE FROM rooms WHERE id = ?", (room_id,))
+        return count
+
+    def room_utilization_report(self):
+        with self._connection() as conn:
+            return [_room_utilization(row) for row in conn.execute(ROOM_UTILIZATION_SQL)]
+
+    def select_rooms(self):
+        query = f"SELECT {ROOM_COLUMNS_SQL} FROM rooms ORDER BY id"
+        with self._connection() as conn:
+            return _execute_records(conn, RoomRecord, query).fetchall()
+
+# Реализации интерфейсов через SQLAlchemy Core: те же таблицы и Engine, что у ORM,
+# но без identity map и unit of work - UPDATE и DELETE выполняются одним запросом
+# без загрузки объекта. Выражения построены один раз при импорте модуля, а
+# значения передаются через bindparam, поэтому Engine берёт скомпилированный SQL
+# из своего кэша (create_engine(query_cache_size=...)) и не компилирует его заново.
+# Работают с любым диалектом SQLAlchemy, а не только с SQLite
+_trainers = Trainer.__table__
+_equipment = Equipment.__table__
+_rooms = Room.__table__
+_trainer_equipment = TrainerEquipment.__table__
+_trainer_allocation = TrainerAllocation.__table__
+
+TRAINER_INSERT = insert(_trainers)
+TRAINER_UPDATE_ROOM = update(_trainers)\
+                        .where(_trainers.c.id == bindparam('trainer_id'))\
+                        .values(room_id=bindparam('room_id'))
+TRAINER_UPDATE_SPEC = update(_trainers)\
+                        .where(_trainers.c.id == bindparam('trainer_id'))\
+                        .values(specialization=bindparam('specialization'))
+TRAINER_DELETE = delete(_trainers).where(_trainers.c.id == bindparam('trainer_id'))
+TRAINERS_BY_ROOM = select(*_record_columns(_trainers.c, TrainerRecord)).where(_trainers.c.room_id == bindparam('room_id'))
+TRAINERS_BY_ROOM_PAGE = TRAINERS_BY_ROOM\
+                        .where(_trainers.c.id > bindparam('after_id'))\
+                        .order_by(_trainers.c.id)\
+                        .limit(bindparam('limit'))
+
+EQUIPMENT_INSERT = insert(_equipment)
+EQUIPMENT_PAGE = select(*_record_columns(_equipment.c, EquipmentRecord))\
+                    .where(_equipment.c.id > bindparam('after_id'))\
+                    .order_by(_equipment.c.id)\
+                    .limit(bindparam('limit'))
+TRAINER_EQUIPMENT_BY_TRAINER = select(_equipment.c.name, _trainer_equipment.c.quantity)\
+                                .join(_equipment, _trainer_equipment.c.equipment_id == _equipment.c.id)\
+                                .where(_trainer_equipment.c.trainer_id == bindparam('trainer_id'))
+TRAINER_EQUIPMENT_RECORDS = select(*_record_columns(_trainer_equipment.c, TrainerEquipmentRecord))\
+                            .where(_trainer_equipment.c.trainer_id == bindparam('trainer_id'))\
+                            .order_by(_trainer_equipment.c.equipment_id)
+TRAINER_EQUIPMENT_ALL = select(_trainers.c.id, _equipment.c.name, _trainer_equipment.c.quantity)\
+                        .outerjoin(_trainer_equipment, _trainer_equipment.c.trainer_id == _trainers.c.id)\
+                        .outerjoin(_equipment, _trainer_equipment.c.equipment_id == _equipment.c.id)\
+                        .order_by(_trainers.c.id)
+# Запасной вариант upsert для диалектов без ON CONFLICT. Имена столбцов
+# в bindparam у UPDATE зарезервированы, поэтому у параметров префикс b_
+TRAINER_EQUIPMENT_ADD = update(_trainer_equipment)\
+                        .where(_trainer_equipment.c.trainer_id == bindparam('b_trainer_id'))\
+                        .where(_trainer_equipment.c.equipment_id == bindparam('b_equipment_id'))\
+                        .values(quantity=_trainer_equipment.c.quantity + bindparam('b_quantity'))
+TRAINER_EQUIPMENT_INSERT = insert(_trainer_equipment)
+
+# UPDATE закрепления, а для строк, которых ещё нет, INSERT.
+# execute - conn.execute соединения Core или session.execute сессии ORM
+def _add_trainer_equipment_rows(execute, rows):
+    for row in rows:
+        parameters = {f'b_{column}': value for column, value in row.items()}
+        if execute(TRAINER_EQUIPMENT_ADD, parameters).rowcount == 0:
+            execute(TRAINER_EQUIPMENT_INSERT, row)
+
+_equipment_allocated = func.coalesce(EquipmentAllocation.__table__.c.allocated, 0)
+EQUIPMENT_AVAILABILITY = select(
+                            _equipment.c.id, _equipment.c.quantity,
+                            _equipment_allocated, _equipment.c.quantity - _equipment_allocated,
+                        )\
+                        .outerjoin(EquipmentAllocation.__table__,
+                                   EquipmentAllocation.__table__.c.equipment_id == _equipment.c.id)
+EQUIPMENT_AVAILABILITY_BY_ID = EQUIPMENT_AVAILABILITY.where(_equipment.c.id == bindparam('equipment_id'))
+EQUIPMENT_OVER_ALLOCATED = EQUIPMENT_AVAILABILITY\
+                            .where(_equipment_allocated > _equipment.c.quantity)\
+                            .order_by(_equipment.c.id)
+TRAINER_ALLOCATED = select(_trainer_allocation.c.allocated)\
+                    .where(_trainer_allocation.c.trainer_id == bindparam('trainer_id'))
+
+TRAINERS_REASSIGN_ROOM = update(_trainers)\
+                        .where(_trainers.c.room_id == bindparam('old_room_id'))\
+                        .values(room_id=bindparam('new_room_id'))
+
+ROOM_INSERT = insert(_rooms)
+# Как и ORM при удалении зала, отвязываем его тренеров, иначе внешний ключ
+# на СУБД, которые его проверяют, не даст удалить зал. Имя room_id занято
+# параметром SET, поэтому условие использует своё имя
+ROOM_RELEASE_TRAINERS = update(_trainers)\
+                        .where(_trainers.c.room_id == bindparam('deleted_room_id'))\
+                        .values(room_id=None)
+ROOM_DELETE = delete(_rooms).where(_rooms.c.id == bindparam('room_id'))
+ROOMS = select(*_record_columns(_rooms.c, RoomRecord)).order_by(_rooms.c.id)
+ROOM_UTILIZATION = select(
+                        _rooms.c.id, _rooms.c.name, _rooms.c.capacity, func.count(_trainers.c.id),
+                        func.coalesce(func.sum(_trainer_allocation.c.allocated), 0),
+                    )\
+                    .select_from(_rooms)\
+                    .outerjoin(_trainers, _trainers.c.room_id == _rooms.c.id)\
+                    .outerjoin(_trainer_allocation, _trainer_allocation.c.trainer_id == _trainers.c.id)\
+                    .group_by(_rooms.c.id, _rooms.c.name, _rooms.c.capacity)\
+                    .order_by(_rooms.c.id)
+
+# Ошибка триггера остатков из SQLAlchemy превращается в EquipmentOverAllocatedError
+@contextmanager
+def _over_allocation_errors_core():
+    try:
+        yield
+    except IntegrityError as error:
+        if _is_over_allocation(error):
+            raise EquipmentOverAllocatedError(OVER_ALLOCATION_MESSAGE) from error
+        raise
+
+# Core-вариант _delete_trainers_orm на соединении conn внутри транзакции
+def _delete_trainers_core(conn, filters):
+    condition = and_(*(_trainers.c[column] == value for column, value in filters.items()))
+    trainer_ids = select(_trainers.c.id).where(condition)
+    conn.execute(delete(_trainer_equipment).where(_trainer_equipment.c.trainer_id.in_(trainer_ids)))
+    conn.execute(delete(_trainer_allocation).where(_trainer_allocation.c.trainer_id.in_(trainer_ids)))
+    return conn.execute(delete(_trainers).where(condition)).rowcount
+
+class _CoreManager(_DatabaseManager):
+    @property
+    def engine(self):
+        return self.database.engine
+
+    # FTS5 есть только в SQLite. На других СУБД поиск - ILIKE по подстрокам:
+    # каждое слово должно встретиться хотя бы в одном из столбцов, порядок - по id
+    def _search(self, text, limit, statement, table, columns, record_class):
+        if self.engine.dialect.name == 'sqlite':
+            query = _fts_query(text)
+            if query is None:
+                return []
+            with self._connection() as conn:
+                return [record_class._make(row) for row in conn.execute(statement, dict(query=query, limit=limit))]
+        tokens = _SEARCH_TOKEN.findall(text)
+        if not tokens:
+            return []
+        condition = and_(*(or_(*(column.ilike(f'%{token}%') for column in columns)) for token in tokens))
+        fallback = select(*_record_columns(table.c, record_class)).where(condition).order_by(table.c.id).limit(limit)
+        with self._connection() as conn:
+            return [record_class._make(row) for row in conn.execute(fallback)]
+
+    # Соединение на время одного запроса на чтение
+    def _connection(self):
+        return self.engine.connect()
+
+    # Транзакция: commit при успехе, rollback при ошибке
+    def _transaction(self):
+        return self.engine.begin()
+
+class TrainerManagementCore(_CoreManager, TrainerManagementBase):
+    def add_trainer(self, name, specialization, experience_years, room_id):
+        with self._transaction() as conn:
+            conn.execute(TRAINER_INSERT, dict(name=name, specialization=specialization,
+                                              experience_years=experience_years, room_id=room_id))
+
+    def update_trainer_room(self, trainer_id, new_room_id):
+        with self._transaction() as conn:
+            conn.execute(TRAINER_UPDATE_ROOM, dict(trainer_id=trainer_id, room_id=new_room_id))
+
+    def update_trainer_spec(self, trainer_id, new_specialization):
+        with self._transaction() as conn:
+            conn.execute(TRAINER_UPDATE_SPEC, dict(trainer_id=trainer_id, specialization=new_specialization))
+
+    def delete_trainer(self, trainer_id):
+        with self._transaction() as conn:
+            conn.execute(TRAINER_DELETE, dict(trainer_id=trainer_id))
+
+    def select_trainers_by_room(self, room_id):
+        with self._connection() as conn:
+            return [TrainerRecord._make(row) for row in conn.execute(TRAINERS_BY_ROOM, dict(room_id=room_id))]
+
+    def add_trainers_many(self, trainers):
+        rows = [
+            dict(name=name, specialization=specialization, experience_years=experience_years, room_id=room_id)
+            for name, specialization, experience_years, room_id in trainers
+        ]
+        if rows:
+            with self._transaction() as conn:
+                conn.execute(TRAINER_INSERT, rows)
+
+    def iter_trainers_by_room(self, room_id, batch_size=DEFAULT_BATCH_SIZE):
+        with self._connection() as conn:
+            rows = conn\
+                    .execution_options(yield_per=batch_size)\
+                    .execute(TRAINERS_BY_ROOM, dict(room_id=room_id))
+            for row in rows:
+                yield TrainerRecord._make(row)
+
+    def page_trainers_by_room(self, room_id, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        _check_page_size(page_size)
+        after_id = _decode_page_cursor(cursor)
+        parameters = dict(room_id=room_id, after_id=after_id if after_id is not None else -1, limit=page_size + 1)
+        with self._connection() as conn:
+            rows = [TrainerRecord._make(row) for row in conn.execute(TRAINERS_BY_ROOM_PAGE, parameters)]
+        return _make_page(rows, page_size, lambda row: row.id)
+
+    def reassign_trainers_room(self, old_room_id, new_room_id):
+        with self._transaction() as conn:
+            return conn.execute(TRAINERS_REASSIGN_ROOM, dict(old_room_id=old_room_id, new_room_id=new_room_id)).rowcount
+
+    def delete_trainers(self, specialization=None, room_id=None):
+        filters = _trainer_filters(specialization, room_id)
+        with self._transaction() as conn:
+            return _delete_trainers_core(conn, filters)
+
+    def search_trainers(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        return self._search(text, limit, TRAINER_SEARCH, _trainers,
+                            [_trainers.c.name, _trainers.c.specialization], TrainerRecord)
+
+class EquipmentManagementCore(_CoreManager, EquipmentManagementBase):
+    def add_equipment(self, name, type, quantity):
+        with self._transaction() as conn:
+            conn.execute(EQUIPMENT_INSERT, dict(name=name, type=type, quantity=quantity))
+
+    def add_equipment_to_trainer(self, trainer_id, equipment_id, quantity):
+        self._upsert_trainer_equipment([dict(trainer_id=trainer_id, equipment_id=equipment_id, quantity=quantity)])
+
+    def calculate_trainer_equipment(self, trainer_id):
+        with self._connection() as conn:
+            rows = conn.execute(TRAINER_EQUIPMENT_BY_TRAINER, dict(trainer_id=trainer_id))
+            return {name: quantity for name, quantity in rows}
+
+    def calculate_all_trainer_equipment(self):
+        with self._connection() as conn:
+            return _group_trainer_equipment(conn.execute(TRAINER_EQUIPMENT_ALL))
+
+    def add_equipment_many(self, equipment):
+        rows = [dict(name=name, type=type, quantity=quantity) for name, type, quantity in equipment]
+        if rows:
+            with self._transaction() as conn:
+                conn.execute(EQUIPMENT_INSERT, rows)
+
+    def assign_equipment_many(self, assignments):
+        self._upsert_trainer_equipment([
+            dict(trainer_id=trainer_id, equipment_id=equipment_id, quantity=quantity)
+            for trainer_id, equipment_id, quantity in assignments
+        ])
+
+    def iter_trainer_equipment(self, batch_size=DEFAULT_BATCH_SIZE):
+        with self._connection() as conn:
+            rows = conn.execution_options(yield_per=batch_size).execute(TRAINER_EQUIPMENT_ALL)
+            yield from _iter_grouped_trainer_equipment(rows)
+
+    def page_equipment(self, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        _check_page_size(page_size)
+        after_id = _decode_page_cursor(cursor)
+        parameters = dict(after_id=after_id if after_id is not None else -1, limit=page_size + 1)
+        with self._connection() as conn:
+            rows = [EquipmentRecord._make(row) for row in conn.execute(EQUIPMENT_PAGE, parameters)]
+        return _make_page(rows, page_size, lambda row: row.id)
+
+    def get_equipment_availability(self, equipment_id):
+        with self._connection() as conn:
+            row = conn.execute(EQUIPMENT_AVAILABILITY_BY_ID, dict(equipment_id=equipment_id)).first()
+        return EquipmentAvailability(*row) if row else None
+
+    def select_over_allocated_equipment(self):
+        with self._connection() as conn:
+            return [EquipmentAvailability(*row) for row in conn.execute(EQUIPMENT_OVER_ALLOCATED)]
+
+    def get_trainer_allocated(self, trainer_id):
+        with self._connection() as conn:
+            allocated = conn.execute(TRAINER_ALLOCATED, dict(trainer_id=trainer_id)).scalar()
+        return allocated or 0
+
+    def search_equipment(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        return self._search(text, limit, EQUIPMENT_SEARCH, _equipment,
+                            [_equipment.c.name, _equipment.c.type], EquipmentRecord)
+
+    def select_trainer_equipment(self, trainer_id):
+        with self._connection() as conn:
+            rows = conn.execute(TRAINER_EQUIPMENT_RECORDS, dict(trainer_id=trainer_id))
+            return [TrainerEquipmentRecord._make(row) for row in rows]
+
+    # Закрепление пакета одной транзакцией: upsert диалекта через executemany,
+    # а без ON CONFLICT - UPDATE и INSERT для строк, которых ещё нет
+    def _upsert_trainer_equipment(self, rows):
+        if not rows:
+            return
+        upsert = TRAINER_EQUIPMENT_UPSERTS.get(self.engine.dialect.name)
+        with _over_allocation_errors_core(), self._transaction() as conn:
+            if upsert is not None:
+                conn.execute(upsert, rows)
+                return
+            _add_trainer_equipment_rows(conn.execute, rows)
+
+class RoomManagementCore(_CoreManager, RoomManagementBase):
+    def add_room(self, name, location, capacity):
+        with self._transaction() as conn:
+            conn.execute(ROOM_INSERT, dict(name=name, location=location, capacity=capacity))
+
+    def delete_room(self, room_id):
+        with self._transaction() as conn:
+            conn.execute(ROOM_RELEASE_TRAINERS, dict(deleted_room_id=room_id))
+            conn.execute(ROOM_DELETE, dict(room_id=room_id))
+
+    def add_rooms_many(self, rooms):
+        rows = [dict(name=name, location=location, capacity=capacity) for name, location, capacity in rooms]
+        if rows:
+            with self._transaction() as conn:
+                conn.execute(ROOM_INSERT, rows)
+
+    def delete_room_cascade(self, room_id):
+        with self._transaction() as conn:
+            count = _delete_trainers_core(conn, {'room_id': room_id})
+            conn.execute(ROOM_DELETE, dict(room_id=room_id))
+        return count
+
+    def room_utilization_report(self):
+        with self._connection() as conn:
+            return [_room_utilization(row) for row in conn.execute(ROOM_UTILIZATION)]
+
+    def select_rooms(self):
+        with self._connection() as conn:
+            return [RoomRecord._make(row) for row in conn.execute(ROOMS)]
+
+# Асинхронные реализации интерфейсов для asyncio-сервисов. sqlite3 блокирует
+# поток, поэтому каждый вызов выполняется в пуле потоков (как это делает aiosqlite)
+# поверх DB API-менеджеров: семантика та же, а пул соединений Database
+# ограничивает число одновременных запросов
+class _AsyncManager:
+    _sync_class = None
+
+    def __init__(self, database=None):
+        self._sync = self._sync_class(database)
+
+    @property
+    def database(self):
+        return self._sync.database
+
+    async def _run(self, method, *args):
+        return await asyncio.to_thread(method, *args)
+
+    # Асинхронная итерация по синхронному генератору: каждый пакет
+    # из batch_size элементов читается в пуле потоков
+    async def _iterate(self, iterator, batch_size):
+        read = None
+        try:
+            while True:
+                read = asyncio.ensure_future(asyncio.to_thread(lambda: list(itertools.islice(iterator, batch_size))))
+                # Отмена не прерывает чтение пакета в потоке, поэтому ждём его через shield
+                batch = await asyncio.shield(read)
+                if not batch:
+                    return
+                for item in batch:
+                    yield item
+        finally:
+            # После отмены генератор ещё выполняется в потоке: закрываем его, когда
+            # пакет дочитан, иначе close() падает с "generator already executing".
+            # Закрытие тоже идёт в потоке - генератор возвращает соединение в пул
+            if read is not None and not read.done():
+                await asyncio.wait([read])
+                read.exception()
+            await asyncio.to_thread(iterator.close)
+
+class TrainerManagementAsync(_AsyncManager, TrainerManagementBase):
+    _sync_class = TrainerManagementDBAPI
+
+    async def add_trainer(self, name, specialization, experience_years, room_id):
+        return await self._run(self._sync.add_trainer, name, specialization, experience_years, room_id)
+
+    async def update_trainer_room(self, trainer_id, new_room_id):
+        return await self._run(self._sync.update_trainer_room, trainer_id, new_room_id)
+
+    async def update_trainer_spec(self, trainer_id, new_specialization):
+        return await self._run(self._sync.update_trainer_spec, trainer_id, new_specialization)
+
+    async def delete_trainer(self, trainer_id):
+        return await self._run(self._sync.delete_trainer, trainer_id)
+
+    async def select_trainers_by_room(self, room_id):
+        return await self._run(self._sync.select_trainers_by_room, room_id)
+
+    async def add_trainers_many(self, trainers):
+        # Итерируемый объект может быть генератором - читаем его до передачи в поток
+        return await self._run(self._sync.add_trainers_many, list(trainers))
+
+    async def iter_trainers_by_room(self, room_id, batch_size=DEFAULT_BATCH_SIZE):
+        async for trainer in self._iterate(self._sync.iter_trainers_by_room(room_id, batch_size), batch_size):
+            yield trainer
+
+    async def page_trainers_by_room(self, room_id, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        return await self._run(self._sync.page_trainers_by_room, room_id, page_size, cursor)
+
+    async def reassign_trainers_room(self, old_room_id, new_room_id):
+        return await self._run(self._sync.reassign_trainers_room, old_room_id, new_room_id)
+
+    async def delete_trainers(self, specialization=None, room_id=None):
+        return await self._run(self._sync.delete_trainers, specialization, room_id)
+
+    async def search_trainers(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        return await self._run(self._sync.search_trainers, text, limit)
+
+    # Тренеры нескольких залов параллельно: {room_id: [тренеры]}
+    async def select_trainers_by_rooms(self, room_ids):
+        room_ids = list(room_ids)
+        results = await asyncio.gather(*(self.select_trainers_by_room(room_id) for room_id in room_ids))
+        return dict(zip(room_ids, results))
+
+class EquipmentManagementAsync(_AsyncManager, EquipmentManagementBase):
+    _sync_class = EquipmentManagementDBAPI
+
+    async def add_equipment(self, name, type, quantity):
+        return await self._run(self._sync.add_equipment, name, type, quantity)
+
+    async def add_equipment_to_trainer(self, trainer_id, equipment_id, quantity):
+        return await self._run(self._sync.add_equipment_to_trainer, trainer_id, equipment_id, quantity)
+
+    async def calculate_trainer_equipment(self, trainer_id):
+        return await self._run(self._sync.calculate_trainer_equipment, trainer_id)
+
+    async def calculate_all_trainer_equipment(self):
+        return await self._run(self._sync.calculate_all_trainer_equipment)
+
+    async def add_equipment_many(self, equipment):
+        return await self._run(self._sync.add_equipment_many, list(equipment))
+
+    async def assign_equipment_many(self, assignments):
+        return await self._run(self._sync.assign_equipment_many, list(assignments))
+
+    async def iter_trainer_equipment(self, batch_size=DEFAULT_BATCH_SIZE):
+        async for item in self._iterate(self._sync.iter_trainer_equipment(batch_size), batch_size):
+            yield item
+
+    async def page_equipment(self, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        return await self._run(self._sync.page_equipment, page_size, cursor)
+
+    async def get_equipment_availability(self, equipment_id):
+        return await self._run(self._sync.get_equipment_availability, equipment_id)
+
+    async def select_over_allocated_equipment(self):
+        return await self._run(self._sync.select_over_allocated_equipment)
+
+    async def get_trainer_allocated(self, trainer_id):
+        return await self._run(self._sync.get_trainer_allocated, trainer_id)
+
+    async def search_equipment(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        return await self._run(self._sync.search_equipment, text, limit)
+
+    async def select_trainer_equipment(self, trainer_id):
+        return await self._run(self._sync.select_trainer_equipment, trainer_id)
+
+    # Оборудование нескольких тренеров параллельно: {trainer_id: {наименование: количество}}
+    async def calculate_trainers_equipment(self, trainer_ids):
+        trainer_ids = list(trainer_ids)
+        results = await asyncio.gather(*(self.calculate_trainer_equipment(trainer_id) for trainer_id in trainer_ids))
+        return dict(zip(trainer_ids, results))
+
+class RoomManagementAsync(_AsyncManager, RoomManagementBase):
+    _sync_class = RoomManagementDBAPI
+
+    async def add_room(self, name, location, capacity):
+        return await self._run(self._sync.add_room, name, location, capacity)
+
+    async def delete_room(self, room_id):
+        return await self._run(self._sync.delete_room, room_id)
+
+    async def add_rooms_many(self, rooms):
+        return await self._run(self._sync.add_rooms_many, list(rooms))
+
+    async def delete_room_cascade(self, room_id):
+        return await self._run(self._sync.delete_room_cascade, room_id)
+
+    async def room_utilization_report(self):
+        return await self._run(self._sync.room_utilization_report)
+
+    async def select_rooms(self):
+        return await self._run(self._sync.select_rooms)
 
 def create_test_data(trainer_manager_orm, equipment_manager_orm, room_manager_orm, trainer_manager_dbapi, equipment_manager_dbapi, room_manager_dbapi):
+    # Каждый пакет добавляется одной транзакцией
     # Добавляем 2 зала с помощью ORM
-    room_manager_orm.add_room("Зал бокса", "ул. Ленина, 10", 20)
-    room_manager_orm.add_room("Кардио зона", "пр. Мира, 5", 30)
+    room_manager_orm.add_rooms_many([
+        ("Зал бокса", "ул. Ленина, 10", 20),
+        ("Кардио зона", "пр. Мира, 5", 30),
+    ])
 
     # Добавляем 2 зала с помощью DBAPI
-    room_manager_dbapi.add_room("Зона свободных весов", "ул. Гагарина, 15", 40)
-    room_manager_dbapi.add_room("Зал групповых программ", "ул. Космонавтов, 2", 25)
+    room_manager_dbapi.add_rooms_many([
+        ("Зона свободных весов", "ул. Гагарина, 15", 40),
+        ("Зал групповых программ", "ул. Космонавтов, 2", 25),
+    ])
 
     # Добавляем 3 тренера с помощью ORM
-    trainer_manager_orm.add_trainer("Иванов Иван Иванович", "Бодибилдинг", 10, 1)
-    trainer_manager_orm.add_trainer("Петров Петр Петрович", "Пауэрлифтинг", 5, 1)
-    trainer_manager_orm.add_trainer("Сидорова Анна Сергеевна", "Фитнес", 3, 2)
+    trainer_manager_orm.add_trainers_many([
+        ("Иванов Иван Иванович", "Бодибилдинг", 10, 1),
+        ("Петров Петр Петрович", "Пауэрлифтинг", 5, 1),
+        ("Сидорова Анна Сергеевна", "Фитнес", 3, 2),
+    ])
 
     # Добавляем 3 тренера с помощью DBAPI
-    trainer_manager_dbapi.add_trainer("Смирнов Алексей Иванович", "Кроссфит", 7, 2)
-    trainer_manager_dbapi.add_trainer("Козлова Елена Владимировна", "Пилатес", 2, 1)
-    trainer_manager_dbapi.add_trainer("Волков Дмитрий Андреевич", "TRX", 4, 2)
+    trainer_manager_dbapi.add_trainers_many([
+        ("Смирнов Алексей Иванович", "Кроссфит", 7, 2),
+        ("Козлова Елена Владимировна", "Пилатес", 2, 1),
+        ("Волков Дмитрий Андреевич", "TRX", 4, 2),
+    ])
 
     # Добавляем 3 единицы оборудования с помощью ORM
-    equipment_manager_orm.add_equipment("Гантели 2кг", "Силовая тренировка", 20)
-    equipment_manager_orm.add_equipment("Беговая дорожка", "Кардио", 5)
-    equipment_manager_orm.add_equipment("Тренажер Смита", "Силовая тренировка", 2)
+    equipment_manager_orm.add_equipment_many([
+        ("Гантели 2кг", "Силовая тренировка", 20),
+        ("Беговая дорожка", "Кардио", 5),
+        ("Тренажер Смита", "Силовая тренировка", 2),
+    ])
 
     # Добавляем 3 единицы оборудования с помощью DBAPI
-    equipment_manager_dbapi.add_equipment("Велотренажер", "Кардио", 3)
-    equipment_manager_dbapi.add_equipment("Эллиптический тренажер", "Кардио", 4)
-    equipment_manager_dbapi.add_equipment("Гиря 16кг", "Силовая тренировка", 10)
+    equipment_manager_dbapi.add_equipment_many([
+        ("Велотренажер", "Кардио", 3),
+        ("Эллиптический тренажер", "Кардио", 4),
+        ("Гиря 16кг", "Силовая тренировка", 10),
+    ])
 
     #Привязываем оборудование к тренерам
     #trainer_id, equipment_id, quantity
 
-    equipment_manager_orm.add_equipment_to_trainer(1, 1, 5)
-    equipment_manager_orm.add_equipment_to_trainer(1, 2, 2)
-    equipment_manager_orm.add_equipment_to_trainer(2, 3, 1)
-    equipment_manager_orm.add_equipment_to_trainer(3, 4, 8)
-    equipment_manager_orm.add_equipment_to_trainer(4, 5, 10)
-
-    equipment_manager_dbapi.add_equipment_to_trainer(5, 1, 3)
-    equipment_manager_dbapi.add_equipment_to_trainer(4, 2, 1)
-    equipment_manager_dbapi.add_equipment_to_trainer(3, 3, 2)
-    equipment_manager_dbapi.add_equipment_to_trainer(2, 4, 6)
-    equipment_manager_dbapi.add_equipment_to_trainer(1, 5, 5)
+    # Закрепления не превышают остатки на складе: Тренажер Смита 1 + 1 из 2,
+    # Велотренажер 2 + 1 из 3, Эллиптический тренажер 2 + 2 из 4
+    equipment_manager_orm.assign_equipment_many([
+        (1, 1, 5),
+        (1, 2, 2),
+        (2, 3, 1),
+        (3, 4, 2),
+        (4, 5, 2),
+    ])
+
+    equipment_manager_dbapi.assign_equipment_many([
+        (5, 1, 3),
+        (4, 2, 1),
+        (3, 3, 1),
+        (2, 4, 1),
+        (1, 5, 2),
+    ])
 
 if __name__ == '__main__':
     pass
     # Создание базы данных и таблиц, если они не существуют.
     # Для первоначальной настройки. Alembic обрабатывает последующие изменения.
-    # Base.metadata.create_all(engine)
+    # Base.metadata.create_all(get_database().engine)
 
     trainer_manager_orm = TrainerManagementORM()
     equipment_manager_orm = EquipmentManagementORM()
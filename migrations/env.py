@@ -4,25 +4,35 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
-from main import Base
+from main import Base, FTS_TABLES, resolve_database_url
 
 config = context.config
 
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-config.set_main_option('sqlalchemy.url', 'sqlite:///kachalka.db')
+# Строка подключения берётся из KACHALKA_DB_URL / KACHALKA_DB_PATH, по умолчанию sqlite:///kachalka.db
+config.set_main_option('sqlalchemy.url', resolve_database_url())
 
 print("Base:", Base)
 target_metadata = Base.metadata
 print("Target Metadata:", target_metadata)
 
 
+# Таблицы FTS5 и их служебные таблицы (trainers_fts_data, ...) создаются миграцией
+# вручную и в метаданных не описаны, autogenerate их не трогает
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and reflected and name.startswith(FTS_TABLES):
+        return False
+    return True
+
+
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -40,7 +50,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
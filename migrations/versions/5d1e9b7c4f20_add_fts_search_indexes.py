@@ -0,0 +1,105 @@
+"""add fts search indexes
+
+Revision ID: 5d1e9b7c4f20
+Revises: a3c5e1f2b7d4
+Create Date: 2026-10-16 23:41:07.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1e9b7c4f20'
+down_revision: Union[str, None] = 'a3c5e1f2b7d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Индексы FTS5 для поиска тренеров и оборудования и триггеры, которые держат их
+# в согласии с таблицами (см. main.SEARCH_DDL). Ё в индексе заменяется на Е
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE trainers_fts USING fts5(
+        name, specialization, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER trainers_fts_insert AFTER INSERT ON trainers
+    BEGIN
+        INSERT INTO trainers_fts (rowid, name, specialization) VALUES (NEW.id, replace(replace(NEW.name, 'ё', 'е'), 'Ё', 'Е'), replace(replace(NEW.specialization, 'ё', 'е'), 'Ё', 'Е'));
+    END
+    """,
+    """
+    CREATE TRIGGER trainers_fts_update AFTER UPDATE OF id, name, specialization ON trainers
+    BEGIN
+        DELETE FROM trainers_fts WHERE rowid = OLD.id;
+        INSERT INTO trainers_fts (rowid, name, specialization) VALUES (NEW.id, replace(replace(NEW.name, 'ё', 'е'), 'Ё', 'Е'), replace(replace(NEW.specialization, 'ё', 'е'), 'Ё', 'Е'));
+    END
+    """,
+    """
+    CREATE TRIGGER trainers_fts_delete AFTER DELETE ON trainers
+    BEGIN
+        DELETE FROM trainers_fts WHERE rowid = OLD.id;
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE equipment_fts USING fts5(
+        name, type, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER equipment_fts_insert AFTER INSERT ON equipment
+    BEGIN
+        INSERT INTO equipment_fts (rowid, name, type) VALUES (NEW.id, replace(replace(NEW.name, 'ё', 'е'), 'Ё', 'Е'), replace(replace(NEW.type, 'ё', 'е'), 'Ё', 'Е'));
+    END
+    """,
+    """
+    CREATE TRIGGER equipment_fts_update AFTER UPDATE OF id, name, type ON equipment
+    BEGIN
+        DELETE FROM equipment_fts WHERE rowid = OLD.id;
+        INSERT INTO equipment_fts (rowid, name, type) VALUES (NEW.id, replace(replace(NEW.name, 'ё', 'е'), 'Ё', 'Е'), replace(replace(NEW.type, 'ё', 'е'), 'Ё', 'Е'));
+    END
+    """,
+    """
+    CREATE TRIGGER equipment_fts_delete AFTER DELETE ON equipment
+    BEGIN
+        DELETE FROM equipment_fts WHERE rowid = OLD.id;
+    END
+    """,
+]
+
+TRIGGER_NAMES = [
+    'trainers_fts_insert',
+    'trainers_fts_update',
+    'trainers_fts_delete',
+    'equipment_fts_insert',
+    'equipment_fts_update',
+    'equipment_fts_delete',
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in SEARCH_DDL:
+        op.execute(statement)
+    # Начальное заполнение индексов из существующих строк
+    op.execute("""
+        INSERT INTO trainers_fts (rowid, name, specialization)
+        SELECT id, replace(replace(name, 'ё', 'е'), 'Ё', 'Е'), replace(replace(specialization, 'ё', 'е'), 'Ё', 'Е')
+        FROM trainers
+    """)
+    op.execute("""
+        INSERT INTO equipment_fts (rowid, name, type)
+        SELECT id, replace(replace(name, 'ё', 'е'), 'Ё', 'Е'), replace(replace(type, 'ё', 'е'), 'Ё', 'Е')
+        FROM equipment
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGER_NAMES:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS equipment_fts")
+    op.execute("DROP TABLE IF EXISTS trainers_fts")
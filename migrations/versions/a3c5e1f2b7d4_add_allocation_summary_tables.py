@@ -0,0 +1,117 @@
+"""add allocation summary tables
+
+Revision ID: a3c5e1f2b7d4
+Revises: 059d099d7d75
+Create Date: 2026-10-16 22:29:18.393841
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c5e1f2b7d4'
+down_revision: Union[str, None] = '059d099d7d75'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Триггеры поддерживают сводные таблицы при любых изменениях trainer_equipment
+# и отклоняют закрепление сверх остатка на складе (см. main.ALLOCATION_TRIGGERS)
+TRIGGERS = [
+    """
+    CREATE TRIGGER trainer_equipment_check_stock BEFORE INSERT ON trainer_equipment
+    WHEN NEW.quantity > 0 AND NEW.quantity >
+        (SELECT quantity FROM equipment WHERE id = NEW.equipment_id)
+        - COALESCE((SELECT allocated FROM equipment_allocation WHERE equipment_id = NEW.equipment_id), 0)
+    BEGIN
+        SELECT RAISE(ABORT, 'equipment over-allocated');
+    END
+    """,
+    """
+    CREATE TRIGGER trainer_equipment_check_stock_update BEFORE UPDATE OF quantity, equipment_id ON trainer_equipment
+    WHEN NEW.quantity - (CASE WHEN NEW.equipment_id = OLD.equipment_id THEN OLD.quantity ELSE 0 END) > 0
+        AND NEW.quantity - (CASE WHEN NEW.equipment_id = OLD.equipment_id THEN OLD.quantity ELSE 0 END) >
+        (SELECT quantity FROM equipment WHERE id = NEW.equipment_id)
+        - COALESCE((SELECT allocated FROM equipment_allocation WHERE equipment_id = NEW.equipment_id), 0)
+    BEGIN
+        SELECT RAISE(ABORT, 'equipment over-allocated');
+    END
+    """,
+    """
+    CREATE TRIGGER trainer_equipment_allocate AFTER INSERT ON trainer_equipment
+    BEGIN
+        INSERT INTO equipment_allocation (equipment_id, allocated) VALUES (NEW.equipment_id, NEW.quantity)
+        ON CONFLICT(equipment_id) DO UPDATE SET allocated = allocated + excluded.allocated;
+        INSERT INTO trainer_allocation (trainer_id, allocated) VALUES (NEW.trainer_id, NEW.quantity)
+        ON CONFLICT(trainer_id) DO UPDATE SET allocated = allocated + excluded.allocated;
+    END
+    """,
+    """
+    CREATE TRIGGER trainer_equipment_reallocate AFTER UPDATE OF trainer_id, equipment_id, quantity ON trainer_equipment
+    BEGIN
+        UPDATE equipment_allocation SET allocated = allocated - OLD.quantity WHERE equipment_id = OLD.equipment_id;
+        UPDATE trainer_allocation SET allocated = allocated - OLD.quantity WHERE trainer_id = OLD.trainer_id;
+        INSERT INTO equipment_allocation (equipment_id, allocated) VALUES (NEW.equipment_id, NEW.quantity)
+        ON CONFLICT(equipment_id) DO UPDATE SET allocated = allocated + excluded.allocated;
+        INSERT INTO trainer_allocation (trainer_id, allocated) VALUES (NEW.trainer_id, NEW.quantity)
+        ON CONFLICT(trainer_id) DO UPDATE SET allocated = allocated + excluded.allocated;
+    END
+    """,
+    """
+    CREATE TRIGGER trainer_equipment_release AFTER DELETE ON trainer_equipment
+    BEGIN
+        UPDATE equipment_allocation SET allocated = allocated - OLD.quantity WHERE equipment_id = OLD.equipment_id;
+        UPDATE trainer_allocation SET allocated = allocated - OLD.quantity WHERE trainer_id = OLD.trainer_id;
+    END
+    """,
+]
+
+TRIGGER_NAMES = [
+    'trainer_equipment_check_stock',
+    'trainer_equipment_check_stock_update',
+    'trainer_equipment_allocate',
+    'trainer_equipment_reallocate',
+    'trainer_equipment_release',
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('equipment_allocation',
+    sa.Column('equipment_id', sa.Integer(), nullable=False),
+    sa.Column('allocated', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['equipment_id'], ['equipment.id'], ),
+    sa.PrimaryKeyConstraint('equipment_id')
+    )
+    op.create_table('trainer_allocation',
+    sa.Column('trainer_id', sa.Integer(), nullable=False),
+    sa.Column('allocated', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['trainer_id'], ['trainers.id'], ),
+    sa.PrimaryKeyConstraint('trainer_id')
+    )
+    # ### end Alembic commands ###
+    # Начальное заполнение из уже существующих закреплений (без проверки остатков:
+    # превышения, сделанные до миграции, видны через select_over_allocated_equipment)
+    op.execute("""
+        INSERT INTO equipment_allocation (equipment_id, allocated)
+        SELECT equipment_id, SUM(quantity) FROM trainer_equipment GROUP BY equipment_id
+    """)
+    op.execute("""
+        INSERT INTO trainer_allocation (trainer_id, allocated)
+        SELECT trainer_id, SUM(quantity) FROM trainer_equipment GROUP BY trainer_id
+    """)
+    for trigger in TRIGGERS:
+        op.execute(trigger)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGER_NAMES:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('trainer_allocation')
+    op.drop_table('equipment_allocation')
+    # ### end Alembic commands ###
@@ -0,0 +1,81 @@
+# Параллельный calculate_all_trainer_equipment для больших баз.
+#
+#   from parallel import calculate_all_trainer_equipment_parallel
+#   report = calculate_all_trainer_equipment_parallel(database, workers=8)
+#
+# Диапазон ID тренеров делится на shards отрезков, каждый отрезок считается в пуле
+# процессов на своём соединении SQLite только для чтения, частичные словари
+# склеиваются в порядке отрезков. Результат совпадает с последовательным
+# calculate_all_trainer_equipment, включая порядок ключей (по ID тренера).
+# Сборка словарей упирается в процессор, поэтому используются процессы, а не потоки
+# Каждый отрезок читается в своей транзакции: при одновременной записи отрезки
+# могут отражать разные моменты времени, для согласованного отчёта нужна пауза в записи
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+from main import get_database, _group_trainer_equipment
+
+# Отрезков на один процесс по умолчанию: ID распределены неравномерно (удалённые
+# тренеры), поэтому отрезков больше, чем процессов, и свободный процесс берёт следующий
+SHARDS_PER_WORKER = 4
+
+TRAINER_ID_RANGE_SQL = "SELECT MIN(id), MAX(id) FROM trainers"
+
+# TRAINER_EQUIPMENT_SQL из main.py, ограниченный отрезком ID тренеров
+TRAINER_EQUIPMENT_SHARD_SQL = """
+    SELECT t.id, e.name, te.quantity
+    FROM trainers t
+    LEFT JOIN trainer_equipment te ON te.trainer_id = t.id
+    LEFT JOIN equipment e ON te.equipment_id = e.id
+    WHERE t.id BETWEEN ? AND ?
+    ORDER BY t.id
+"""
+
+# Соединение только для чтения: mode=ro в URI и query_only на случай, если файл
+# всё же открыт с правом записи
+def _connect_read_only(path, busy_timeout):
+    conn = sqlite3.connect(f'file:{quote(os.path.abspath(path))}?mode=ro', uri=True, timeout=busy_timeout / 1000)
+    conn.execute('PRAGMA query_only = 1')
+    return conn
+
+# Выполняется в процессе пула: словарь тренеров с ID в отрезке [low, high]
+def _calculate_shard(path, busy_timeout, low, high):
+    conn = _connect_read_only(path, busy_timeout)
+    try:
+        return _group_trainer_equipment(conn.execute(TRAINER_EQUIPMENT_SHARD_SQL, (low, high)))
+    finally:
+        conn.close()
+
+# Делит [low, high] на не более чем shards непересекающихся отрезков подряд
+def _split_range(low, high, shards):
+    size = -(-(high - low + 1) // shards)
+    return [(start, min(start + size - 1, high)) for start in range(low, high + 1, size)]
+
+# workers - число процессов (по умолчанию os.cpu_count()), shards - число отрезков
+# (по умолчанию workers * SHARDS_PER_WORKER). При workers=1 отрезки считаются
+# последовательно в текущем процессе
+def calculate_all_trainer_equipment_parallel(database=None, workers=None, shards=None):
+    database = database or get_database()
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers * SHARDS_PER_WORKER
+    conn = _connect_read_only(database.path, database.busy_timeout)
+    try:
+        low, high = conn.execute(TRAINER_ID_RANGE_SQL).fetchone()
+    finally:
+        conn.close()
+    if low is None:
+        return {}
+    ranges = _split_range(low, high, shards)
+    arguments = [(database.path, database.busy_timeout, start, end) for start, end in ranges]
+    if workers == 1:
+        partials = [_calculate_shard(*shard) for shard in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+            # map возвращает результаты в порядке отрезков
+            partials = list(executor.map(_calculate_shard, *zip(*arguments)))
+    result = {}
+    for partial in partials:
+        result.update(partial)
+    return result
@@ -0,0 +1,314 @@
+# Реплика для чтения: снимок основной базы, на который уходят отчёты и выборки.
+#
+#   replica = ReadReplica(database, max_staleness=5.0)          # снимок в памяти
+#   replica = ReadReplica(database, path='replica.db')          # снимок в файлах replica.<N>.db
+#   replica.start()                                              # обновление по расписанию
+#   trainers = ReplicaTrainerManagement(TrainerManagementDBAPI(database), replica)
+#   equipment = ReplicaEquipmentManagement(EquipmentManagementDBAPI(database), replica)
+#   equipment.calculate_all_trainer_equipment()                  # читает снимок
+#   equipment.add_equipment_to_trainer(1, 2, 3)                  # пишет в основную базу
+#
+# Снимок снимается backup API sqlite3 за один шаг (pages=-1): это одна читающая
+# транзакция, в режиме WAL она не мешает записи. Каждое обновление создаёт новый
+# снимок и подменяет им текущий, чтения на старом снимке дорабатывают на нём,
+# после чего старый снимок закрывается (и его файлы удаляются).
+# Данные снимка отстают от основной базы не больше чем на max_staleness секунд:
+# чтение на более старом снимке сначала обновляет его. start() обновляет снимок
+# в фоновом потоке, чтобы чтения почти никогда не ждали обновления.
+# Запись через обёртку сразу в снимке не видна (нет чтения своих записей)
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from main import (
+    DEFAULT_BATCH_SIZE, DEFAULT_PAGE_SIZE, DEFAULT_SEARCH_LIMIT, SESSION_READ_ONLY, Database, get_database,
+    TrainerManagementBase, EquipmentManagementBase, RoomManagementBase, _ORMManager,
+)
+
+# Допустимое отставание снимка от основной базы по умолчанию, секунды
+DEFAULT_MAX_STALENESS = 5.0
+
+_replica_ids = itertools.count(1)
+
+# Снимок базы: своя Database и менеджеры поверх неё. leases - число чтений,
+# которые сейчас идут на снимке; снятый с учёта (retired) снимок закрывается,
+# когда их не остаётся
+class _Snapshot:
+    def __init__(self, database, taken_at, anchor=None, files=()):
+        self.database = database
+        self.taken_at = taken_at
+        # Соединение, в которое сделан backup. Для снимка в памяти оно держит базу:
+        # общая база в памяти живёт, пока открыто хотя бы одно соединение
+        self._anchor = anchor
+        self._files = files
+        self._managers = {}
+        self.leases = 0
+        self.retired = False
+
+    # Менеджер того же класса, что и manager основной базы. ORM-менеджеры
+    # работают в режиме SESSION_READ_ONLY: сессия на вызов, запись отклоняется
+    def manager(self, manager_class):
+        manager = self._managers.get(manager_class)
+        if manager is None:
+            if issubclass(manager_class, _ORMManager):
+                manager = manager_class(self.database, session_mode=SESSION_READ_ONLY)
+            else:
+                manager = manager_class(self.database)
+            self._managers[manager_class] = manager
+        return manager
+
+    def close(self):
+        self.database.close()
+        if self._anchor is not None:
+            self._anchor.close()
+        for path in self._files:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+# database - основная база (по умолчанию get_database()). path - шаблон файла
+# снимка: снимки пишутся в '<path без расширения>.<N><расширение>'; без path
+# снимок хранится в памяти. max_staleness - допустимый возраст снимка в секундах
+class ReadReplica:
+    def __init__(self, database=None, path=None, max_staleness=DEFAULT_MAX_STALENESS, clock=time.monotonic):
+        self.database = database or get_database()
+        self.path = path
+        self.max_staleness = max_staleness
+        self._clock = clock
+        self._name = f'kachalka_replica_{os.getpid()}_{next(_replica_ids)}'
+        self._generations = itertools.count(1)
+        self._current = None
+        # _lock защищает _current и счётчики аренды, _refresh_lock не даёт
+        # нескольким потокам снимать снимок одновременно
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = None
+        self._thread = None
+        self.refreshes = 0
+
+    # Возраст текущего снимка в секундах (None, если снимка ещё нет)
+    @property
+    def age(self):
+        current = self._current
+        return None if current is None else self._clock() - current.taken_at
+
+    def _is_fresh(self, snapshot):
+        return snapshot is not None and self._clock() - snapshot.taken_at <= self.max_staleness
+
+    def _take_snapshot(self):
+        generation = next(self._generations)
+        if self.path is None:
+            target = f'file:{self._name}_{generation}?mode=memory&cache=shared'
+            # Для базы в памяти SQLAlchemy держит по соединению на поток, а закрывает
+            # их из потока, который обновил снимок
+            url = f'sqlite:///{target}&uri=true&check_same_thread=false'
+            files = ()
+        else:
+            root, extension = os.path.splitext(self.path)
+            target = url = None
+            files = (f'{root}.{generation}{extension}',)
+        anchor = sqlite3.connect(target or files[0], uri=target is not None, check_same_thread=False)
+        try:
+            # Время снимка - до начала копирования: данные не старше этого момента
+            taken_at = self._clock()
+            with self.database.connection() as source:
+                source.backup(anchor)
+        except Exception:
+            anchor.close()
+            raise
+        if files:
+            # Файл снимка больше не нужен этому соединению, читатели откроют свои
+            anchor.close()
+            anchor = None
+        database = Database(url=url, path=target or files[0], pool_size=self.database.pool_size,
+                            pool_timeout=self.database.pool_timeout, busy_timeout=self.database.busy_timeout)
+        return _Snapshot(database, taken_at, anchor, files)
+
+    # Снимает новый снимок и делает его текущим
+    def refresh(self):
+        with self._refresh_lock:
+            self._refresh()
+
+    def _refresh(self):
+        snapshot = self._take_snapshot()
+        with self._lock:
+            previous, self._current = self._current, snapshot
+            self.refreshes += 1
+        if previous is not None:
+            self._retire(previous)
+
+    def _retire(self, snapshot):
+        with self._lock:
+            snapshot.retired = True
+            idle = snapshot.leases == 0
+        if idle:
+            snapshot.close()
+
+    # Снимок не старше max_staleness на время блока with
+    @contextmanager
+    def snapshot(self):
+        snapshot = self._current
+        if not self._is_fresh(snapshot):
+            with self._refresh_lock:
+                # Пока ждали блокировку, снимок мог обновить другой поток
+                if not self._is_fresh(self._current):
+                    self._refresh()
+        with self._lock:
+            snapshot = self._current
+            snapshot.leases += 1
+        try:
+            yield snapshot
+        finally:
+            with self._lock:
+                snapshot.leases -= 1
+                idle = snapshot.retired and snapshot.leases == 0
+            if idle:
+                snapshot.close()
+
+    # Фоновое обновление раз в interval секунд (по умолчанию max_staleness / 2)
+    def start(self, interval=None):
+        if self._thread is not None:
+            return
+        interval = interval or self.max_staleness / 2
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(interval, self._stop),
+                                        name='kachalka-replica', daemon=True)
+        self._thread.start()
+
+    def _run(self, interval, stop):
+        while not stop.is_set():
+            try:
+                self.refresh()
+            except sqlite3.Error:
+                # Снимок обновится при следующем проходе или при чтении
+                pass
+            stop.wait(interval)
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._stop = None
+
+    def close(self):
+        self.stop()
+        with self._refresh_lock, self._lock:
+            current, self._current = self._current, None
+        if current is not None:
+            self._retire(current)
+
+# Общая часть обёрток. Запись идёт в manager основной базы, отчёты и выборки -
+# в менеджер того же класса на снимке replica. Несколько обёрток могут делить
+# одну ReadReplica. Кэширующие обёртки из cache.py ставятся поверх этих
+class _ReplicaManager:
+    def __init__(self, manager, replica=None):
+        self.manager = manager
+        self.replica = replica if replica is not None else ReadReplica(manager.database)
+
+    def _read(self, name, *args):
+        with self.replica.snapshot() as snapshot:
+            return getattr(snapshot.manager(type(self.manager)), name)(*args)
+
+    # Потоковые выборки держат снимок, пока генератор не дочитан или не закрыт
+    def _iterate(self, name, *args):
+        with self.replica.snapshot() as snapshot:
+            yield from getattr(snapshot.manager(type(self.manager)), name)(*args)
+
+class ReplicaTrainerManagement(_ReplicaManager, TrainerManagementBase):
+    def add_trainer(self, name, specialization, experience_years, room_id):
+        return self.manager.add_trainer(name, specialization, experience_years, room_id)
+
+    def update_trainer_room(self, trainer_id, new_room_id):
+        return self.manager.update_trainer_room(trainer_id, new_room_id)
+
+    def update_trainer_spec(self, trainer_id, new_specialization):
+        return self.manager.update_trainer_spec(trainer_id, new_specialization)
+
+    def delete_trainer(self, trainer_id):
+        return self.manager.delete_trainer(trainer_id)
+
+    def select_trainers_by_room(self, room_id):
+        return self._read('select_trainers_by_room', room_id)
+
+    def add_trainers_many(self, trainers):
+        return self.manager.add_trainers_many(trainers)
+
+    def iter_trainers_by_room(self, room_id, batch_size=DEFAULT_BATCH_SIZE):
+        return self._iterate('iter_trainers_by_room', room_id, batch_size)
+
+    def page_trainers_by_room(self, room_id, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        return self._read('page_trainers_by_room', room_id, page_size, cursor)
+
+    def reassign_trainers_room(self, old_room_id, new_room_id):
+        return self.manager.reassign_trainers_room(old_room_id, new_room_id)
+
+    def delete_trainers(self, specialization=None, room_id=None):
+        return self.manager.delete_trainers(specialization, room_id)
+
+    def search_trainers(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        return self._read('search_trainers', text, limit)
+
+class ReplicaEquipmentManagement(_ReplicaManager, EquipmentManagementBase):
+    def add_equipment(self, name, type, quantity):
+        return self.manager.add_equipment(name, type, quantity)
+
+    def add_equipment_to_trainer(self, trainer_id, equipment_id, quantity):
+        return self.manager.add_equipment_to_trainer(trainer_id, equipment_id, quantity)
+
+    def calculate_trainer_equipment(self, trainer_id):
+        return self._read('calculate_trainer_equipment', trainer_id)
+
+    def calculate_all_trainer_equipment(self):
+        return self._read('calculate_all_trainer_equipment')
+
+    def add_equipment_many(self, equipment):
+        return self.manager.add_equipment_many(equipment)
+
+    def assign_equipment_many(self, assignments):
+        return self.manager.assign_equipment_many(assignments)
+
+    def iter_trainer_equipment(self, batch_size=DEFAULT_BATCH_SIZE):
+        return self._iterate('iter_trainer_equipment', batch_size)
+
+    def page_equipment(self, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        return self._read('page_equipment', page_size, cursor)
+
+    # По остаткам решают, можно ли закрепить оборудование, поэтому они
+    # читаются из основной базы, а не из снимка
+    def get_equipment_availability(self, equipment_id):
+        return self.manager.get_equipment_availability(equipment_id)
+
+    def select_over_allocated_equipment(self):
+        return self._read('select_over_allocated_equipment')
+
+    def get_trainer_allocated(self, trainer_id):
+        return self.manager.get_trainer_allocated(trainer_id)
+
+    def search_equipment(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        return self._read('search_equipment', text, limit)
+
+    def select_trainer_equipment(self, trainer_id):
+        return self._read('select_trainer_equipment', trainer_id)
+
+class ReplicaRoomManagement(_ReplicaManager, RoomManagementBase):
+    def add_room(self, name, location, capacity):
+        return self.manager.add_room(name, location, capacity)
+
+    def delete_room(self, room_id):
+        return self.manager.delete_room(room_id)
+
+    def add_rooms_many(self, rooms):
+        return self.manager.add_rooms_many(rooms)
+
+    def delete_room_cascade(self, room_id):
+        return self.manager.delete_room_cascade(room_id)
+
+    def room_utilization_report(self):
+        return self._read('room_utilization_report')
+
+    def select_rooms(self):
+        return self._read('select_rooms')
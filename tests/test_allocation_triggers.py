@@ -0,0 +1,116 @@
+# Триггеры trainer_equipment: сводные таблицы закреплений и запрет закрепления
+# сверх остатка на складе
+import sqlite3
+
+import pytest
+
+from conftest import BACKENDS
+from main import EquipmentOverAllocatedError, EquipmentManagementDBAPI, create_test_data
+
+
+@pytest.fixture
+def managers(backend):
+    trainers, equipment, rooms = backend
+    rooms.add_rooms_many([("Зал", "ул. Ленина, 1", 20)])
+    trainers.add_trainers_many([("Иванов Иван", "Фитнес", 3, 1), ("Петров Петр", "TRX", 5, 1)])
+    # Гантели: 10 на складе, Беговая дорожка: 2
+    equipment.add_equipment_many([("Гантели", "Силовая тренировка", 10), ("Беговая дорожка", "Кардио", 2)])
+    return backend
+
+
+def _allocated(equipment, equipment_id):
+    return equipment.get_equipment_availability(equipment_id).allocated
+
+
+def test_assignments_update_summaries(managers):
+    _, equipment, _ = managers
+    equipment.assign_equipment_many([(1, 1, 4), (2, 1, 3), (1, 2, 1)])
+    equipment.add_equipment_to_trainer(1, 1, 2)
+    availability = equipment.get_equipment_availability(1)
+    assert (availability.quantity, availability.allocated, availability.available) == (10, 9, 1)
+    assert equipment.get_trainer_allocated(1) == 7
+    assert equipment.get_trainer_allocated(2) == 3
+    assert equipment.calculate_trainer_equipment(1) == {"Гантели": 6, "Беговая дорожка": 1}
+
+
+def test_allocation_up_to_stock_is_allowed(managers):
+    _, equipment, _ = managers
+    equipment.assign_equipment_many([(1, 2, 1), (2, 2, 1)])
+    assert equipment.get_equipment_availability(2).available == 0
+    assert equipment.select_over_allocated_equipment() == []
+
+
+def test_over_allocation_is_rejected(managers):
+    _, equipment, _ = managers
+    equipment.add_equipment_to_trainer(1, 2, 2)
+    with pytest.raises(EquipmentOverAllocatedError):
+        equipment.add_equipment_to_trainer(2, 2, 1)
+    # Увеличение уже существующего закрепления проверяется так же
+    with pytest.raises(EquipmentOverAllocatedError):
+        equipment.add_equipment_to_trainer(1, 2, 1)
+    assert _allocated(equipment, 2) == 2
+    assert equipment.calculate_trainer_equipment(2) == {}
+
+
+def test_rejected_batch_is_rolled_back(managers):
+    _, equipment, _ = managers
+    with pytest.raises(EquipmentOverAllocatedError):
+        equipment.assign_equipment_many([(1, 1, 5), (2, 2, 3)])
+    assert _allocated(equipment, 1) == 0
+    assert equipment.get_trainer_allocated(1) == 0
+    assert equipment.calculate_trainer_equipment(1) == {}
+
+
+def test_deleting_trainers_releases_equipment(managers):
+    trainers, equipment, _ = managers
+    equipment.assign_equipment_many([(1, 1, 4), (2, 1, 3), (2, 2, 2)])
+    trainers.delete_trainers(specialization="Фитнес")
+    assert _allocated(equipment, 1) == 3
+    trainers.delete_trainers(room_id=1)
+    assert _allocated(equipment, 1) == 0
+    assert _allocated(equipment, 2) == 0
+    # Освобождённое оборудование снова можно закрепить
+    trainers.add_trainer("Сидорова Анна", "Фитнес", 1, 1)
+    equipment.add_equipment_to_trainer(3, 2, 2)
+    assert _allocated(equipment, 2) == 2
+
+
+def test_update_triggers_move_and_check_allocation(database, managers):
+    _, equipment, _ = managers
+    equipment.assign_equipment_many([(1, 1, 2), (2, 2, 2)])
+    with database.connection() as conn:
+        # Перенос закрепления на другое оборудование переносит и сумму
+        conn.execute("UPDATE trainer_equipment SET equipment_id = 2, quantity = 0 WHERE trainer_id = 1")
+        conn.execute("UPDATE trainer_equipment SET equipment_id = 1 WHERE trainer_id = 1")
+        conn.commit()
+        with pytest.raises(sqlite3.IntegrityError, match='equipment over-allocated'):
+            conn.execute("UPDATE trainer_equipment SET quantity = 11 WHERE trainer_id = 1")
+        conn.rollback()
+        # Уменьшение закрепления разрешено и без остатка на складе
+        conn.execute("UPDATE trainer_equipment SET quantity = 1 WHERE trainer_id = 2")
+        conn.commit()
+    assert _allocated(equipment, 1) == 0
+    assert _allocated(equipment, 2) == 1
+    assert equipment.get_trainer_allocated(1) == 0
+
+
+def test_seed_data_fits_into_stock(database):
+    managers = [manager_class(database) for manager_class in BACKENDS['orm'] + BACKENDS['dbapi']]
+    create_test_data(*managers)
+    equipment = EquipmentManagementDBAPI(database)
+    assert equipment.select_over_allocated_equipment() == []
+    assert len(equipment.calculate_all_trainer_equipment()) == 6
+    database.remove_session()
+
+
+def test_assignments_without_on_conflict(managers, monkeypatch):
+    # Диалект без upsert (как MSSQL): ORM и Core закрепляют через UPDATE и INSERT
+    monkeypatch.setattr('main.TRAINER_EQUIPMENT_UPSERTS', {})
+    _, equipment, _ = managers
+    equipment.assign_equipment_many([(1, 1, 4), (1, 1, 1), (2, 2, 1)])
+    equipment.add_equipment_to_trainer(1, 1, 2)
+    assert equipment.calculate_trainer_equipment(1) == {"Гантели": 7}
+    with pytest.raises(EquipmentOverAllocatedError):
+        equipment.assign_equipment_many([(2, 1, 1), (2, 2, 2)])
+    assert _allocated(equipment, 1) == 7
+    assert _allocated(equipment, 2) == 1
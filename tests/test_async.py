@@ -0,0 +1,38 @@
+# Асинхронные менеджеры поверх синхронных в пуле потоков
+import asyncio
+import threading
+
+import pytest
+
+from main import TrainerManagementAsync
+
+
+def test_cancelled_iteration_closes_generator(database):
+    started, release = threading.Event(), threading.Event()
+    closed = []
+
+    def rows():
+        try:
+            yield 1
+            started.set()
+            release.wait(5)
+            yield 2
+        finally:
+            closed.append(threading.current_thread() is not threading.main_thread())
+
+    async def consume():
+        async for _ in TrainerManagementAsync(database)._iterate(rows(), 2):
+            pass
+
+    async def run():
+        task = asyncio.create_task(consume())
+        await asyncio.to_thread(started.wait, 5)
+        # Отмена приходит, пока пакет читается в потоке
+        task.cancel()
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert closed == [True]
+
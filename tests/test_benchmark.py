@@ -0,0 +1,24 @@
+# Нагрузочный прогон: каждый метод интерфейсов замеряется на каждом бэкенде
+import pytest
+
+import benchmark
+
+
+def test_every_interface_method_is_measured(tmp_path):
+    report = benchmark.run([60], sorted(benchmark.BACKENDS), samples=2, seed=0, workdir=str(tmp_path))
+    for backend in benchmark.BACKENDS:
+        methods = {result['method'] for result in report['results'] if result['backend'] == backend}
+        assert methods == benchmark.INTERFACE_METHODS
+
+
+def test_missing_scenario_is_rejected(tmp_path, monkeypatch):
+    scenarios = benchmark.scenarios
+    monkeypatch.setattr(benchmark, 'scenarios', lambda *args: [
+        scenario for scenario in scenarios(*args) if scenario[0] != 'search_trainers'
+    ])
+    path = str(tmp_path / 'gym.db')
+    database = benchmark.Database(path=path)
+    sizes = benchmark.generate_gym(database, 60)
+    database.close()
+    with pytest.raises(ValueError, match='search_trainers'):
+        benchmark.run_backend('dbapi', path, sizes, samples=1, seed=0)
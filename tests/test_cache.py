@@ -0,0 +1,113 @@
+# LRUCache и кэширующие обёртки менеджеров
+import pytest
+
+from cache import LRUCache, CachedTrainerManagement, CachedRoomManagement, cached_managers
+from main import (
+    TrainerManagementDBAPI, EquipmentManagementDBAPI, RoomManagementDBAPI,
+    TrainerManagementORM, RoomManagementORM,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def gym(database):
+    RoomManagementDBAPI(database).add_rooms_many([("Зал 1", "ул. Ленина, 1", 20), ("Зал 2", "ул. Мира, 2", 30)])
+    TrainerManagementDBAPI(database).add_trainers_many([("Иванов Иван", "Фитнес", 3, 1), ("Петров Петр", "TRX", 5, 1)])
+    yield database
+    database.remove_session()
+
+
+def _names(trainers):
+    return sorted(trainer.name for trainer in trainers)
+
+
+def test_update_trainer_room_drops_old_room(gym):
+    trainers = CachedTrainerManagement(TrainerManagementDBAPI(gym))
+    assert _names(trainers.select_trainers_by_room(1)) == ["Иванов Иван", "Петров Петр"]
+    assert trainers.select_trainers_by_room(2) == []
+    # Старый зал в вызов не передаётся: его список сбрасывается по тегу тренера
+    trainers.update_trainer_room(1, 2)
+    assert _names(trainers.select_trainers_by_room(1)) == ["Петров Петр"]
+    assert _names(trainers.select_trainers_by_room(2)) == ["Иванов Иван"]
+
+
+def test_delete_room_drops_trainers_without_room(gym):
+    cache = LRUCache()
+    trainers = CachedTrainerManagement(TrainerManagementORM(gym), cache)
+    rooms = CachedRoomManagement(RoomManagementORM(gym), cache)
+    assert trainers.select_trainers_by_room(None) == []
+    rooms.delete_room(1)
+    assert _names(trainers.select_trainers_by_room(None)) == ["Иванов Иван", "Петров Петр"]
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(ttl=10.0, clock=clock)
+    cache.set('key', 'value')
+    clock.now = 9.9
+    assert cache.get('key') == 'value'
+    clock.now = 10.0
+    assert cache.get('key', None) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # Чтение делает 'a' свежее 'b', поэтому вытесняется 'b'
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b', None) is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_stale_read_is_not_cached():
+    cache = LRUCache()
+    # Значение прочитано из БД до записи, которая инвалидировала кэш
+    generation = cache.generation
+    cache.invalidate('key')
+    cache.set('key', 'stale', generation=generation)
+    assert cache.get('key', None) is None
+    cache.set('key', 'fresh', generation=cache.generation)
+    assert cache.get('key') == 'fresh'
+
+
+def test_stats_count_hits_and_misses(gym):
+    trainers = CachedTrainerManagement(TrainerManagementDBAPI(gym))
+    for _ in range(3):
+        trainers.select_trainers_by_room(1)
+    trainers.select_trainers_by_room(2)
+    stats = trainers.cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 2, 2)
+    assert stats['hit_ratio'] == 0.5
+
+
+def test_room_report_is_invalidated_by_every_wrapper(gym):
+    EquipmentManagementDBAPI(gym).add_equipment_many([("Гантели", "Силовая тренировка", 10)])
+    trainers, equipment, rooms = cached_managers(
+        TrainerManagementDBAPI(gym), EquipmentManagementDBAPI(gym), RoomManagementDBAPI(gym),
+    )
+
+    def report():
+        return [(row.room_id, row.trainers, row.equipment_units) for row in rooms.room_utilization_report()]
+
+    assert report() == [(1, 2, 0), (2, 0, 0)]
+    trainers.update_trainer_room(1, 2)
+    assert report() == [(1, 1, 0), (2, 1, 0)]
+    equipment.add_equipment_to_trainer(2, 1, 3)
+    assert report() == [(1, 1, 3), (2, 1, 0)]
+    rooms.add_room("Зал 3", "ул. Садовая, 3", 10)
+    assert report() == [(1, 1, 3), (2, 1, 0), (3, 0, 0)]
+    # Без записей отчёт берётся из кэша
+    hits = rooms.cache.hits
+    report()
+    assert rooms.cache.hits == hits + 1
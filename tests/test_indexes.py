@@ -0,0 +1,45 @@
+# Поиск по вторичным ключам должен идти по индексам, а не полным просмотром таблиц
+import os
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from main import Database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (запрос, индекс, который он должен использовать)
+LOOKUPS = [
+    ("SELECT * FROM trainers WHERE room_id = ?", 'ix_trainers_room_id'),
+    ("SELECT * FROM trainer_equipment WHERE equipment_id = ?", 'ix_trainer_equipment_equipment_id'),
+    ("SELECT * FROM equipment WHERE type = ?", 'ix_equipment_type'),
+]
+
+
+@pytest.fixture
+def migrated_database(tmp_path, monkeypatch):
+    path = str(tmp_path / 'kachalka.db')
+    monkeypatch.setenv('KACHALKA_DB_PATH', path)
+    monkeypatch.delenv('KACHALKA_DB_URL', raising=False)
+    config = Config(os.path.join(ROOT, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(ROOT, 'migrations'))
+    command.upgrade(config, 'head')
+    database = Database(path=path)
+    yield database
+    database.close()
+
+
+def _query_plan(database, query):
+    with database.connection() as conn:
+        return ' '.join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", (1,)))
+
+
+@pytest.mark.parametrize('query, index', LOOKUPS)
+def test_create_all_lookup_uses_index(database, query, index):
+    assert f'USING INDEX {index}' in _query_plan(database, query)
+
+
+@pytest.mark.parametrize('query, index', LOOKUPS)
+def test_migrated_lookup_uses_index(migrated_database, query, index):
+    assert f'USING INDEX {index}' in _query_plan(migrated_database, query)
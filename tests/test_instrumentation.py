@@ -0,0 +1,45 @@
+# Статистика вызова должна включать только запросы самого метода, без настройки
+# нового соединения (PRAGMA, первые запросы диалекта SQLAlchemy)
+import pytest
+
+from instrumentation import QueryRecorder
+from main import (
+    Base, Database, EquipmentManagementDBAPI, RoomManagementDBAPI, TrainerManagementDBAPI, TrainerManagementORM,
+)
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    path = str(tmp_path / 'kachalka.db')
+    # Схема и данные создаются без инструментирования, чтобы соединения проверяемой
+    # базы были новыми
+    setup = Database(path=path)
+    Base.metadata.create_all(setup.engine)
+    RoomManagementDBAPI(setup).add_rooms_many([("Зал", "ул. Ленина, 1", 20)])
+    TrainerManagementDBAPI(setup).add_trainers_many([
+        ("Иванов Иван", "Фитнес", 3, 1),
+        ("Петров Петр", "TRX", 5, 1),
+    ])
+    setup.close()
+    recorder = QueryRecorder()
+    database = Database(path=path, instrumentation=recorder)
+    yield recorder, database
+    database.close()
+
+
+def test_dbapi_first_call_counts_only_its_statements(recorder):
+    recorder, database = recorder
+    manager = recorder.instrument(EquipmentManagementDBAPI(database))
+    manager.calculate_all_trainer_equipment()
+    stats = recorder.stats()['EquipmentManagementDBAPI.calculate_all_trainer_equipment']
+    assert stats['statements'] == 1
+    assert stats['rows'] == 2
+
+
+def test_orm_first_call_counts_only_its_rows(recorder):
+    recorder, database = recorder
+    manager = recorder.instrument(TrainerManagementORM(database))
+    assert len(manager.select_trainers_by_room(1)) == 2
+    stats = recorder.stats()['TrainerManagementORM.select_trainers_by_room']
+    assert stats['statements'] == 1
+    assert stats['rows'] == 2
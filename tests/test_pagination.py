@@ -0,0 +1,85 @@
+# Keyset-пагинация page_trainers_by_room и page_equipment на всех бэкендах
+import pytest
+
+from main import RoomManagementDBAPI, TrainerManagementDBAPI, EquipmentManagementDBAPI
+
+
+@pytest.fixture
+def managers(backend, database):
+    RoomManagementDBAPI(database).add_rooms_many([("Зал 1", "ул. Ленина, 1", 20), ("Зал 2", "ул. Мира, 2", 30)])
+    # Тренеры двух залов вперемешку: 7 в зале 1 (нечётные ID), 6 в зале 2
+    TrainerManagementDBAPI(database).add_trainers_many(
+        (f"Тренер {i}", "Фитнес", i, 1 if i % 2 else 2) for i in range(1, 14)
+    )
+    EquipmentManagementDBAPI(database).add_equipment_many(
+        (f"Снаряд {i}", "Кардио", 10) for i in range(1, 6)
+    )
+    return backend[:2]
+
+
+def _all_pages(fetch, page_size):
+    pages, cursor = [], None
+    while True:
+        page, cursor = fetch(page_size, cursor)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_trainer_pages_cover_room_in_id_order(managers):
+    trainers, _ = managers
+    pages = _all_pages(lambda size, cursor: trainers.page_trainers_by_room(1, size, cursor), 3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [trainer.id for page in pages for trainer in page]
+    assert ids == [1, 3, 5, 7, 9, 11, 13]
+    assert ids == [trainer.id for trainer in trainers.select_trainers_by_room(1)]
+
+
+def test_last_full_page_has_no_cursor(managers):
+    trainers, _ = managers
+    page, cursor = trainers.page_trainers_by_room(2, 6)
+    assert len(page) == 6
+    assert cursor is None
+
+
+def test_cursor_is_not_shifted_by_inserts(managers):
+    trainers, _ = managers
+    first, cursor = trainers.page_trainers_by_room(1, 3)
+    # Новый тренер получает ID больше всех выданных, поэтому появляется в конце,
+    # а уже выданные строки не повторяются (OFFSET сдвинул бы страницы)
+    trainers.add_trainer("Новый тренер", "TRX", 1, 1)
+    rest = []
+    while cursor is not None:
+        page, cursor = trainers.page_trainers_by_room(1, 3, cursor)
+        rest.extend(page)
+    ids = [trainer.id for trainer in first + rest]
+    assert ids == [1, 3, 5, 7, 9, 11, 13, 14]
+
+
+def test_equipment_pages(managers):
+    _, equipment = managers
+    pages = _all_pages(equipment.page_equipment, 2)
+    assert [[item.id for item in page] for page in pages] == [[1, 2], [3, 4], [5]]
+
+
+def test_empty_room_has_single_empty_page(managers):
+    trainers, _ = managers
+    assert trainers.page_trainers_by_room(99) == ([], None)
+
+
+@pytest.mark.parametrize('page_size', [0, -1, 2.5, None])
+def test_invalid_page_size(managers, page_size):
+    trainers, equipment = managers
+    with pytest.raises(ValueError):
+        trainers.page_trainers_by_room(1, page_size)
+    with pytest.raises(ValueError):
+        equipment.page_equipment(page_size)
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', 'e30', '!!!'])
+def test_invalid_cursor(managers, cursor):
+    trainers, equipment = managers
+    with pytest.raises(ValueError):
+        trainers.page_trainers_by_room(1, 3, cursor)
+    with pytest.raises(ValueError):
+        equipment.page_equipment(3, cursor)
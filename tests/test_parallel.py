@@ -0,0 +1,40 @@
+# Параллельный calculate_all_trainer_equipment совпадает с последовательным
+import pytest
+
+from main import RoomManagementDBAPI, TrainerManagementDBAPI, EquipmentManagementDBAPI
+from parallel import calculate_all_trainer_equipment_parallel
+
+
+@pytest.fixture
+def gym(database):
+    RoomManagementDBAPI(database).add_rooms_many([("Зал", "ул. Ленина, 1", 20)])
+    trainers = TrainerManagementDBAPI(database)
+    trainers.add_trainers_many((f"Тренер {i}", "Фитнес" if i % 3 else "TRX", 1, 1) for i in range(1, 41))
+    equipment = EquipmentManagementDBAPI(database)
+    equipment.add_equipment_many((f"Снаряд {i}", "Кардио", 1000) for i in range(1, 6))
+    # У части тренеров нет закреплений, у части - несколько
+    equipment.assign_equipment_many(
+        (trainer_id, equipment_id, trainer_id % 4 + 1)
+        for trainer_id in range(1, 41) if trainer_id % 5
+        for equipment_id in range(1, trainer_id % 3 + 2)
+    )
+    # Дыры в диапазоне ID: целые отрезки могут оказаться пустыми
+    trainers.delete_trainers(specialization="TRX")
+    for trainer_id in range(20, 31):
+        trainers.delete_trainer(trainer_id)
+    yield database
+    database.remove_session()
+
+
+@pytest.mark.parametrize('workers, shards', [(1, None), (1, 7), (3, None), (4, 40)])
+def test_parallel_matches_sequential(gym, workers, shards):
+    expected = EquipmentManagementDBAPI(gym).calculate_all_trainer_equipment()
+    result = calculate_all_trainer_equipment_parallel(gym, workers=workers, shards=shards)
+    assert result == expected
+    assert list(result) == list(expected)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_empty_trainers_table(database, workers):
+    assert EquipmentManagementDBAPI(database).calculate_all_trainer_equipment() == {}
+    assert calculate_all_trainer_equipment_parallel(database, workers=workers) == {}
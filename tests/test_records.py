@@ -0,0 +1,41 @@
+# Все бэкенды возвращают одинаковые записи (namedtuple) для залов, тренеров,
+# оборудования и закреплений
+import asyncio
+
+import pytest
+
+from main import (
+    RoomRecord, TrainerRecord, EquipmentRecord, TrainerEquipmentRecord,
+    TrainerManagementDBAPI, EquipmentManagementDBAPI, RoomManagementDBAPI,
+    EquipmentManagementAsync, RoomManagementAsync,
+)
+
+
+@pytest.fixture
+def gym(database):
+    RoomManagementDBAPI(database).add_rooms_many([("Зал 1", "ул. Ленина, 1", 20), ("Зал 2", "ул. Мира, 2", 30)])
+    TrainerManagementDBAPI(database).add_trainers_many([("Иванов Иван", "Фитнес", 3, 1), ("Петров Петр", "TRX", 5, 2)])
+    EquipmentManagementDBAPI(database).add_equipment_many([("Гантели", "Силовая тренировка", 10), ("Гиря", "Силовая тренировка", 5)])
+    EquipmentManagementDBAPI(database).assign_equipment_many([(1, 2, 1), (1, 1, 2), (2, 1, 3)])
+    yield database
+    database.remove_session()
+
+
+def test_backends_return_records(gym, backend):
+    trainers, equipment, rooms = backend
+    assert rooms.select_rooms() == [
+        RoomRecord(1, "Зал 1", "ул. Ленина, 1", 20),
+        RoomRecord(2, "Зал 2", "ул. Мира, 2", 30),
+    ]
+    assert trainers.select_trainers_by_room(1) == [TrainerRecord(1, "Иванов Иван", "Фитнес", 3, 1)]
+    assert equipment.page_equipment(1)[0] == [EquipmentRecord(1, "Гантели", "Силовая тренировка", 10)]
+    assert equipment.select_trainer_equipment(1) == [TrainerEquipmentRecord(1, 1, 2), TrainerEquipmentRecord(1, 2, 1)]
+    assert equipment.select_trainer_equipment(99) == []
+
+
+def test_async_backend_returns_records(gym):
+    async def read():
+        return await RoomManagementAsync(gym).select_rooms(), await EquipmentManagementAsync(gym).select_trainer_equipment(2)
+    rooms, assignments = asyncio.run(read())
+    assert [room.name for room in rooms] == ["Зал 1", "Зал 2"]
+    assert assignments == [TrainerEquipmentRecord(2, 1, 3)]
@@ -0,0 +1,112 @@
+# Полнотекстовый поиск search_trainers / search_equipment (FTS5) на всех бэкендах
+import os
+import sqlite3
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from main import Database, TrainerManagementDBAPI, EquipmentManagementDBAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def managers(backend):
+    trainers, equipment, rooms = backend
+    rooms.add_rooms_many([("Зал", "ул. Ленина, 1", 20)])
+    trainers.add_trainers_many([
+        ("Пётр Семёнов", "Кроссфит", 3, 1),
+        ("Иванов Иван", "Фитнес", 5, 1),
+        ("Ёлкина Анна", "Пилатес", 2, 1),
+    ])
+    equipment.add_equipment_many([("Гантели", "Силовая тренировка", 10), ("Беговая дорожка", "Кардио", 2)])
+    return trainers, equipment
+
+
+def _names(records):
+    return [record.name for record in records]
+
+
+def test_search_ignores_case(managers):
+    trainers, equipment = managers
+    assert _names(trainers.search_trainers("КРОСС")) == ["Пётр Семёнов"]
+    assert _names(trainers.search_trainers("кроссфит")) == ["Пётр Семёнов"]
+    assert _names(equipment.search_equipment("ГАНТЕЛИ")) == ["Гантели"]
+
+
+def test_search_matches_prefixes(managers):
+    trainers, equipment = managers
+    assert _names(trainers.search_trainers("Ив")) == ["Иванов Иван"]
+    assert _names(equipment.search_equipment("бег дор")) == ["Беговая дорожка"]
+    # Все слова запроса должны найтись
+    assert trainers.search_trainers("Иван Кроссфит") == []
+
+
+def test_search_folds_yo(managers):
+    trainers, _ = managers
+    # Ё в индексе и в запросе заменяется на Е
+    assert _names(trainers.search_trainers("Петр Семенов")) == ["Пётр Семёнов"]
+    assert _names(trainers.search_trainers("семён")) == ["Пётр Семёнов"]
+    assert _names(trainers.search_trainers("Елкина")) == ["Ёлкина Анна"]
+    assert _names(trainers.search_trainers("ЁЛК")) == ["Ёлкина Анна"]
+
+
+# Кавычки и операторы FTS5 - обычные символы и слова запроса, а не синтаксис MATCH
+@pytest.mark.parametrize('text, expected', [
+    ('"Фитнес', ["Иванов Иван"]),
+    ('Фит*', ["Иванов Иван"]),
+    ('(Фитнес) -', ["Иванов Иван"]),
+    ('specialization:Фитнес', []),
+    ('Фитнес OR Кроссфит', []),
+    ('NOT Фитнес', []),
+])
+def test_search_treats_operators_as_text(managers, text, expected):
+    trainers, _ = managers
+    assert _names(trainers.search_trainers(text)) == expected
+
+
+def test_search_without_words_returns_nothing(managers):
+    trainers, equipment = managers
+    assert trainers.search_trainers('" * - ()') == []
+    assert equipment.search_equipment('') == []
+
+
+def test_search_index_follows_changes(managers):
+    trainers, _ = managers
+    trainers.update_trainer_spec(2, "TRX")
+    assert trainers.search_trainers("Фитнес") == []
+    assert _names(trainers.search_trainers("TRX")) == ["Иванов Иван"]
+    trainers.delete_trainer(1)
+    assert trainers.search_trainers("Кроссфит") == []
+    assert trainers.search_trainers("Пётр") == []
+
+
+def test_search_respects_limit(managers):
+    trainers, _ = managers
+    # "П" - префикс имени одного тренера и специализации другого
+    assert len(trainers.search_trainers("П")) == 2
+    assert len(trainers.search_trainers("П", limit=1)) == 1
+
+
+def test_migration_indexes_existing_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / 'kachalka.db')
+    monkeypatch.setenv('KACHALKA_DB_PATH', path)
+    monkeypatch.delenv('KACHALKA_DB_URL', raising=False)
+    config = Config(os.path.join(ROOT, 'alembic.ini'))
+    config.set_main_option('script_location', os.path.join(ROOT, 'migrations'))
+    # Данные, записанные до появления поиска
+    command.upgrade(config, 'a3c5e1f2b7d4')
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("INSERT INTO rooms (name, location, capacity) VALUES ('Зал', 'ул. Ленина, 1', 20)")
+        conn.execute("INSERT INTO trainers (name, specialization, experience_years, room_id) VALUES ('Пётр Семёнов', 'Кроссфит', 3, 1)")
+        conn.execute("INSERT INTO equipment (name, type, quantity) VALUES ('Гантели', 'Силовая тренировка', 10)")
+    conn.close()
+    command.upgrade(config, 'head')
+    database = Database(path=path)
+    try:
+        assert _names(TrainerManagementDBAPI(database).search_trainers("семенов")) == ["Пётр Семёнов"]
+        assert _names(EquipmentManagementDBAPI(database).search_equipment("силов")) == ["Гантели"]
+    finally:
+        database.close()
@@ -0,0 +1,82 @@
+# Режимы сессии ORM-менеджеров: SESSION_BOUNDED не оставляет объектов в сессии
+# потока, SESSION_READ_ONLY отклоняет запись
+import pytest
+from sqlalchemy import event, inspect
+
+from main import (
+    SESSION_SCOPED, SESSION_BOUNDED, SESSION_READ_ONLY, ReadOnlySessionError, Trainer,
+    TrainerManagementORM, EquipmentManagementORM,
+    RoomManagementDBAPI, TrainerManagementDBAPI, EquipmentManagementDBAPI,
+)
+
+
+@pytest.fixture
+def gym(database):
+    RoomManagementDBAPI(database).add_rooms_many([("Зал 1", "ул. Ленина, 1", 20), ("Зал 2", "ул. Мира, 2", 30)])
+    TrainerManagementDBAPI(database).add_trainers_many(
+        (f"Тренер {i}", "Фитнес", i, 1) for i in range(1, 6)
+    )
+    EquipmentManagementDBAPI(database).add_equipment_many([("Гантели", "Силовая тренировка", 10)])
+    EquipmentManagementDBAPI(database).assign_equipment_many([(1, 1, 2), (2, 1, 3)])
+    yield database
+    database.remove_session()
+
+
+# Тренеры, загруженные ORM за время теста. Ссылки на объекты держит список,
+# иначе они пропали бы из identity map и без expunge
+@pytest.fixture
+def loaded_trainers():
+    loaded = []
+
+    def on_load(trainer, context):
+        loaded.append(trainer)
+    event.listen(Trainer, 'load', on_load)
+    yield loaded
+    event.remove(Trainer, 'load', on_load)
+
+
+def _room_ids(database):
+    with database.connection() as conn:
+        return [room_id for room_id, in conn.execute("SELECT room_id FROM trainers ORDER BY id")]
+
+
+def test_read_only_session_rejects_writes(gym):
+    trainers = TrainerManagementORM(gym, session_mode=SESSION_READ_ONLY)
+    with pytest.raises(ReadOnlySessionError):
+        trainers.add_trainer("Сидорова Анна", "TRX", 1, 2)
+    with pytest.raises(ReadOnlySessionError):
+        trainers.reassign_trainers_room(1, 2)
+    assert _room_ids(gym) == [1] * 5
+    # Чтение работает
+    assert len(trainers.select_trainers_by_room(1)) == 5
+
+
+def test_scoped_session_keeps_loaded_objects(gym, loaded_trainers):
+    TrainerManagementORM(gym, session_mode=SESSION_SCOPED).update_trainer_room(1, 2)
+    assert [trainer in gym.session for trainer in loaded_trainers] == [True]
+
+
+def test_bounded_session_is_emptied_after_each_call(gym, loaded_trainers):
+    trainers = TrainerManagementORM(gym, session_mode=SESSION_BOUNDED)
+    trainers.add_trainer("Сидорова Анна", "TRX", 1, 2)
+    assert len(gym.session.identity_map) == 0
+    trainers.update_trainer_room(1, 2)
+    trainers.update_trainer_spec(2, "TRX")
+    assert len(loaded_trainers) == 2
+    assert all(inspect(trainer).detached for trainer in loaded_trainers)
+    assert len(gym.session.identity_map) == 0
+    assert _room_ids(gym) == [2, 1, 1, 1, 1, 2]
+
+
+def test_bounded_session_is_emptied_after_iteration(gym):
+    trainers = TrainerManagementORM(gym, session_mode=SESSION_BOUNDED)
+    equipment = EquipmentManagementORM(gym, session_mode=SESSION_BOUNDED)
+    assert len(list(trainers.iter_trainers_by_room(1, batch_size=2))) == 5
+    assert len(gym.session.identity_map) == 0
+    assert dict(equipment.iter_trainer_equipment(batch_size=2))[2] == {"Гантели": 3}
+    assert len(gym.session.identity_map) == 0
+    # Недочитанный генератор освобождает сессию при закрытии
+    rows = trainers.iter_trainers_by_room(1, batch_size=2)
+    next(rows)
+    rows.close()
+    assert len(gym.session.identity_map) == 0
@@ -0,0 +1,121 @@
+# Импорт transfer.py: сообщения об ошибках с номерами строк и продолжение
+# прерванного импорта с первого незаписанного пакета
+import json
+
+import pytest
+
+import transfer
+from main import RoomManagementDBAPI, TrainerManagementDBAPI, EquipmentManagementDBAPI
+from transfer import ImportValidationError, export_directory, import_directory, import_table
+
+
+def _write_jsonl(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+
+
+def _rooms(database):
+    with database.connection() as conn:
+        return [name for name, in conn.execute("SELECT name FROM rooms ORDER BY id")]
+
+
+def _checkpoints(database):
+    with database.connection() as conn:
+        return conn.execute("SELECT source, table_name, records FROM import_checkpoints").fetchall()
+
+
+def _room(name):
+    return json.dumps({'name': name, 'location': "ул. Ленина, 1", 'capacity': 20}, ensure_ascii=False)
+
+
+def test_unreadable_jsonl_lines_are_reported(database, tmp_path):
+    path = tmp_path / 'rooms.jsonl'
+    _write_jsonl(path, [_room("Зал 1"), '{"name": "Зал 2",', '[1, 2]', '', '"строка"'])
+    with pytest.raises(ImportValidationError) as error:
+        import_table('rooms', str(path), database)
+    lines = {line: message for line, message in error.value.errors}
+    assert sorted(lines) == [2, 3, 5]
+    assert lines[2].startswith('invalid JSON')
+    assert lines[3] == 'expected a JSON object, got list'
+    assert lines[5] == 'expected a JSON object, got str'
+    assert _rooms(database) == []
+
+
+def test_cli_prints_line_numbers(database, tmp_path, capsys):
+    path = tmp_path / 'rooms.jsonl'
+    _write_jsonl(path, ['not json'])
+    assert transfer.main(['import', '--table', 'rooms', '--file', str(path), '--db', database.path]) == 1
+    assert 'строка 1: invalid JSON' in capsys.readouterr().err
+
+
+def test_resume_does_not_duplicate_keyless_rows(database, tmp_path):
+    path = tmp_path / 'rooms.jsonl'
+    names = [f"Зал {i}" for i in range(1, 6)]
+    broken = [_room(name) for name in names]
+    broken[3] = '{"name": "Зал 4"}'
+    _write_jsonl(path, broken)
+    with pytest.raises(ImportValidationError):
+        import_table('rooms', str(path), database, chunk_size=2)
+    # Первые два пакета записаны вместе с контрольной точкой
+    assert _rooms(database) == names[:2]
+    assert _checkpoints(database) == [(str(path), 'rooms', 2)]
+
+    _write_jsonl(path, [_room(name) for name in names])
+    assert import_table('rooms', str(path), database, chunk_size=2) == 3
+    assert _rooms(database) == names
+    assert _checkpoints(database) == []
+
+
+def test_checkpoint_is_rolled_back_with_its_chunk(database, tmp_path, monkeypatch):
+    path = tmp_path / 'rooms.jsonl'
+    names = [f"Зал {i}" for i in range(1, 5)]
+    _write_jsonl(path, [_room(name) for name in names])
+    # Сбой при записи второго пакета: и пакет, и контрольная точка откатываются
+    save = transfer.CHECKPOINT_SAVE_SQL
+    calls = []
+
+    def failing_write(conn, table, chunk, checkpoint, records):
+        calls.append(records)
+        if len(calls) == 2:
+            monkeypatch.setattr(transfer, 'CHECKPOINT_SAVE_SQL', 'INSERT INTO missing_table VALUES (?, ?, ?)')
+        try:
+            write_chunk(conn, table, chunk, checkpoint, records)
+        finally:
+            monkeypatch.setattr(transfer, 'CHECKPOINT_SAVE_SQL', save)
+
+    write_chunk = transfer._write_chunk
+    monkeypatch.setattr(transfer, '_write_chunk', failing_write)
+    with pytest.raises(Exception):
+        import_table('rooms', str(path), database, chunk_size=2)
+    assert _rooms(database) == names[:2]
+    assert _checkpoints(database) == [(str(path), 'rooms', 2)]
+
+    monkeypatch.setattr(transfer, '_write_chunk', write_chunk)
+    assert import_table('rooms', str(path), database, chunk_size=2) == 2
+    assert _rooms(database) == names
+
+
+def test_checkpoint_of_another_table_is_rejected(database, tmp_path):
+    path = tmp_path / 'rooms.jsonl'
+    _write_jsonl(path, [_room("Зал 1")])
+    with database.connection() as conn, conn:
+        conn.execute("INSERT INTO import_checkpoints VALUES (?, 'trainers', 1)", (str(path),))
+    with pytest.raises(ValueError, match='trainers'):
+        import_table('rooms', str(path), database)
+    assert RoomManagementDBAPI(database).room_utilization_report() == []
+
+
+def test_reimporting_an_export_keeps_assignments(database, tmp_path):
+    RoomManagementDBAPI(database).add_rooms_many([("Зал", "ул. Ленина, 1", 20)])
+    TrainerManagementDBAPI(database).add_trainers_many([("Иванов Иван", "Фитнес", 3, 1), ("Петров Петр", "TRX", 5, 1)])
+    equipment = EquipmentManagementDBAPI(database)
+    # На складе 6, закреплено 5 + 1: повторная запись тех же закреплений не превышает остаток
+    equipment.add_equipment_many([("Гантели", "Силовая тренировка", 6)])
+    equipment.assign_equipment_many([(1, 1, 5), (2, 1, 1)])
+    for format in ('csv', 'jsonl'):
+        directory = str(tmp_path / format)
+        export_directory(directory, database, format)
+        assert import_directory(directory, database, format)['trainer_equipment'] == 2
+        assert equipment.calculate_all_trainer_equipment() == {1: {"Гантели": 5}, 2: {"Гантели": 1}}
+        availability = equipment.get_equipment_availability(1)
+        assert (availability.allocated, availability.available) == (6, 0)
+        assert _rooms(database) == ["Зал"]
@@ -0,0 +1,305 @@
+# Импорт и экспорт таблиц (залы, оборудование, тренеры, закрепления) в CSV и JSONL
+# для синхронизации с внешними таблицами.
+#
+#   python transfer.py export --dir dump                    # dump/<таблица>.csv
+#   python transfer.py import --dir dump --chunk-size 5000
+#   python transfer.py import --table trainers --file trainers.jsonl
+#
+# Импорт читает файл построчно и пишет пакетами по chunk_size записей, каждый пакет -
+# одна транзакция. Внешние ключи пакета проверяются одним запросом на каждую
+# связанную таблицу. Число записанных записей сохраняется в таблицу
+# import_checkpoints в той же транзакции, что и пакет, поэтому повторный запуск
+# после сбоя продолжает ровно со следующего пакета и не дублирует записи, в том
+# числе записи без первичного ключа. Записи с первичным ключом заменяют
+# существующие (UPDATE, а для отсутствующих - INSERT).
+# Экспорт читает результат запроса пакетами и сразу пишет строки в файл
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+
+from sqlalchemy import Integer
+
+from main import (
+    Base, DEFAULT_BATCH_SIZE, Database, EquipmentOverAllocatedError, get_database,
+    _fetch_in_batches, _over_allocation_errors,
+)
+
+# Таблицы в порядке загрузки: связанные раньше ссылающихся на них.
+# Сводные таблицы закреплений не переносятся, их заполняют триггеры;
+# import_checkpoints - служебная таблица самого импорта
+TABLES = ('rooms', 'equipment', 'trainers', 'trainer_equipment')
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl'}
+
+# Число записей в одной транзакции импорта по умолчанию
+DEFAULT_CHUNK_SIZE = 1000
+
+# Ограничение числа параметров в одном IN (...) при проверке внешних ключей
+_MAX_IN_PARAMETERS = 500
+
+# Ошибки проверки пакета: errors - список (номер строки файла, сообщение).
+# Пакет с ошибками не записывается, контрольная точка остаётся на предыдущем
+class ImportValidationError(ValueError):
+    def __init__(self, table, errors):
+        self.table = table
+        self.errors = errors
+        shown = '; '.join(f'line {line}: {message}' for line, message in errors[:10])
+        more = f' (and {len(errors) - 10} more)' if len(errors) > 10 else ''
+        super().__init__(f'{table}: {shown}{more}')
+
+def _table(name):
+    if name not in TABLES:
+        raise ValueError(f"Unknown table {name!r}, expected one of: {', '.join(TABLES)}")
+    return Base.metadata.tables[name]
+
+def _format(path, format=None):
+    if format is not None:
+        if format not in FORMATS.values():
+            raise ValueError(f'Unknown format {format!r}')
+        return format
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f'Cannot detect format of {path!r}, pass format= explicitly')
+    return FORMATS[extension]
+
+# Записи файла по одной: (номер строки, {столбец: значение}, ошибка).
+# Для нечитаемой строки запись - None, ошибка - сообщение, иначе ошибка - None.
+# В CSV пустая ячейка означает NULL
+def _read_records(file, format):
+    if format == 'csv':
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, {column: value if value != '' else None for column, value in record.items()}, None
+    else:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as error:
+                yield line_number, None, f'invalid JSON: {error.msg} (column {error.colno})'
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, f'expected a JSON object, got {type(record).__name__}'
+                continue
+            yield line_number, record, None
+
+# Приведение записи к строке таблицы: проверка столбцов, NOT NULL и целых чисел
+def _convert(table, record):
+    unknown = set(record) - set(table.columns.keys())
+    if unknown:
+        return None, f"unknown columns: {', '.join(sorted(map(str, unknown)))}"
+    row = {}
+    for column in table.columns:
+        value = record.get(column.name)
+        if value is None:
+            # Автоинкрементный id можно не указывать, СУБД назначит его сама
+            if not column.nullable and column is not table.autoincrement_column:
+                return None, f'{column.name} is required'
+        elif isinstance(column.type, Integer):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                return None, f'{column.name} must be an integer, got {value!r}'
+        row[column.name] = value
+    return row, None
+
+def _existing_ids(conn, table, column, ids):
+    existing = set()
+    ids = list(ids)
+    for start in range(0, len(ids), _MAX_IN_PARAMETERS):
+        part = ids[start:start + _MAX_IN_PARAMETERS]
+        query = f"SELECT {column} FROM {table} WHERE {column} IN ({', '.join('?' * len(part))})"
+        existing.update(value for value, in conn.execute(query, part))
+    return existing
+
+# Проверка внешних ключей пакета: по одному запросу на связанную таблицу
+def _check_foreign_keys(conn, table, chunk):
+    errors = []
+    for foreign_key in table.foreign_keys:
+        column = foreign_key.parent.name
+        target = foreign_key.column
+        referenced = {row[column] for _, row in chunk if row[column] is not None}
+        if not referenced:
+            continue
+        missing = referenced - _existing_ids(conn, target.table.name, target.name, referenced)
+        errors.extend(
+            (line, f'{column}={row[column]} not found in {target.table.name}')
+            for line, row in chunk if row[column] in missing
+        )
+    return sorted(errors)
+
+# INSERT строки: без первичного ключа (его назначит база) или с ним
+def _insert_sql(table, with_key):
+    columns = list(table.columns.keys())
+    key = [column.name for column in table.primary_key]
+    if not with_key:
+        columns = [column for column in columns if column not in key]
+    query = f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    return columns, query
+
+# UPDATE строки по первичному ключу: сначала значения столбцов, затем ключ
+def _update_sql(table):
+    key = [column.name for column in table.primary_key]
+    values = [column for column in table.columns.keys() if column not in key]
+    query = f"UPDATE {table.name} SET {', '.join(f'{column} = ?' for column in values)} " \
+            f"WHERE {' AND '.join(f'{column} = ?' for column in key)}"
+    return values + key, query
+
+# Контрольные точки хранятся в таблице import_checkpoints (main.ImportCheckpoint)
+CHECKPOINT_SELECT_SQL = "SELECT table_name, records FROM import_checkpoints WHERE source = ?"
+CHECKPOINT_SAVE_SQL = """
+    INSERT INTO import_checkpoints (source, table_name, records) VALUES (?, ?, ?)
+    ON CONFLICT(source) DO UPDATE SET table_name = excluded.table_name, records = excluded.records
+"""
+CHECKPOINT_DELETE_SQL = "DELETE FROM import_checkpoints WHERE source = ?"
+
+# Пакет и новое значение контрольной точки записываются одной транзакцией
+def _write_chunk(conn, table, chunk, checkpoint, records):
+    key = [column.name for column in table.primary_key]
+    groups = {}
+    for _, row in chunk:
+        groups.setdefault(all(row[column] is not None for column in key), []).append(row)
+    with _over_allocation_errors(), conn:
+        for with_key, rows in groups.items():
+            columns, query = _insert_sql(table, with_key)
+            if not with_key:
+                conn.executemany(query, [tuple(row[column] for column in columns) for row in rows])
+                continue
+            # Строки с ключом заменяют существующие: UPDATE, а если строки нет - INSERT.
+            # Upsert (ON CONFLICT DO UPDATE) не подходит: триггер BEFORE INSERT у
+            # trainer_equipment проверил бы остаток так, будто quantity добавляется
+            # к уже закреплённому, а триггер BEFORE UPDATE проверяет само изменение
+            update_columns, update = _update_sql(table)
+            for row in rows:
+                if conn.execute(update, tuple(row[column] for column in update_columns)).rowcount == 0:
+                    conn.execute(query, tuple(row[column] for column in columns))
+        conn.execute(CHECKPOINT_SAVE_SQL, (checkpoint, table.name, records))
+
+def _load_checkpoint(conn, checkpoint, table):
+    state = conn.execute(CHECKPOINT_SELECT_SQL, (checkpoint,)).fetchone()
+    if state is None:
+        return 0
+    if state[0] != table:
+        raise ValueError(f'Checkpoint {checkpoint!r} belongs to an import into {state[0]!r}')
+    return state[1]
+
+# Импорт файла path в таблицу table пакетами по chunk_size записей.
+# checkpoint - ключ контрольной точки в import_checkpoints (по умолчанию полный
+# путь к файлу), после успешного импорта она удаляется. Возвращает число записей,
+# записанных этим вызовом
+def import_table(table, path, database=None, format=None, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint=None):
+    database = database or get_database()
+    table_name, table = table, _table(table)
+    format = _format(path, format)
+    checkpoint = checkpoint or os.path.abspath(path)
+    imported = 0
+    with open(path, newline='', encoding='utf-8') as file, database.connection() as conn:
+        done = _load_checkpoint(conn, checkpoint, table_name)
+        records = itertools.islice(_read_records(file, format), done, None)
+        while True:
+            chunk, errors = [], []
+            for line, record, error in itertools.islice(records, chunk_size):
+                if error is None:
+                    row, error = _convert(table, record)
+                if error:
+                    errors.append((line, error))
+                else:
+                    chunk.append((line, row))
+            if not chunk and not errors:
+                break
+            errors.extend(_check_foreign_keys(conn, table, chunk))
+            if errors:
+                raise ImportValidationError(table_name, sorted(errors))
+            done += len(chunk)
+            _write_chunk(conn, table, chunk, checkpoint, done)
+            imported += len(chunk)
+        with conn:
+            conn.execute(CHECKPOINT_DELETE_SQL, (checkpoint,))
+    return imported
+
+# Экспорт таблицы в файл в порядке первичного ключа. Возвращает число строк
+def export_table(table, path, database=None, format=None, batch_size=DEFAULT_BATCH_SIZE):
+    database = database or get_database()
+    table_name, table = table, _table(table)
+    format = _format(path, format)
+    columns = list(table.columns.keys())
+    key = ', '.join(column.name for column in table.primary_key)
+    query = f"SELECT {', '.join(columns)} FROM {table_name} ORDER BY {key}"
+    exported = 0
+    with open(path, 'w', newline='', encoding='utf-8') as file, database.connection() as conn:
+        if format == 'csv':
+            writer = csv.writer(file)
+            writer.writerow(columns)
+        for row in _fetch_in_batches(conn.execute(query), batch_size):
+            if format == 'csv':
+                writer.writerow(['' if value is None else value for value in row])
+            else:
+                file.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+            exported += 1
+    return exported
+
+# Все таблицы из каталога directory (файлы '<таблица>.<format>'), в порядке TABLES.
+# Отсутствующие файлы пропускаются. Возвращает {таблица: число записей}
+def import_directory(directory, database=None, format='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    imported = {}
+    for table in TABLES:
+        path = os.path.join(directory, f'{table}.{format}')
+        if os.path.exists(path):
+            imported[table] = import_table(table, path, database, format, chunk_size)
+    return imported
+
+def export_directory(directory, database=None, format='csv', batch_size=DEFAULT_BATCH_SIZE):
+    os.makedirs(directory, exist_ok=True)
+    return {
+        table: export_table(table, os.path.join(directory, f'{table}.{format}'), database, format, batch_size)
+        for table in TABLES
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Импорт и экспорт таблиц в CSV и JSONL")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('--dir', default=None, help="каталог с файлами '<таблица>.<формат>' для всех таблиц")
+    parser.add_argument('--table', choices=TABLES, default=None, help="одна таблица (вместе с --file)")
+    parser.add_argument('--file', default=None, help="файл для одной таблицы, формат - по расширению")
+    parser.add_argument('--format', choices=sorted(set(FORMATS.values())), default=None)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="записей в одной транзакции импорта")
+    parser.add_argument('--checkpoint', default=None,
+                        help="ключ контрольной точки импорта (по умолчанию - полный путь к файлу)")
+    parser.add_argument('--db', default=None, help="путь к файлу БД")
+    args = parser.parse_args(argv)
+
+    if bool(args.dir) == bool(args.table and args.file):
+        parser.error("укажите либо --dir, либо --table и --file")
+    database = Database(path=args.db) if args.db else get_database()
+    try:
+        if args.dir:
+            format = args.format or 'csv'
+            if args.command == 'import':
+                counts = import_directory(args.dir, database, format, args.chunk_size)
+            else:
+                counts = export_directory(args.dir, database, format)
+        elif args.command == 'import':
+            counts = {args.table: import_table(args.table, args.file, database, args.format,
+                                               args.chunk_size, args.checkpoint)}
+        else:
+            counts = {args.table: export_table(args.table, args.file, database, args.format)}
+    except ImportValidationError as error:
+        for line, message in error.errors:
+            print(f"{error.table}: строка {line}: {message}", file=sys.stderr)
+        return 1
+    except EquipmentOverAllocatedError as error:
+        # Пакет откатан вместе с контрольной точкой, она указывает на последний записанный пакет
+        print(f"Закрепление сверх остатка на складе: {error}", file=sys.stderr)
+        return 1
+    finally:
+        database.close()
+    for table, count in counts.items():
+        print(f"{table}: {count}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())